@@ -1,72 +1,21 @@
 import os
+import env_file  # loads .env before any module reads its settings
 import streamlit as st
-from openai import OpenAI
-from dotenv import load_dotenv
-import PyPDF2
-import io
-import base64
-import time
-import threading
 from datetime import datetime
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER
-from reportlab.lib import colors
-import re  # Added for improved table detection and heading parsing
-
-# Load environment variables from .env file
-load_dotenv()
-
-# DIRECT APPROACH - Hardcoding the OpenAI client (same as in the simple app that works)
-# The key from the .env file is working in our test script, so use the exact same approach
-try:
-    with open(".env", "r") as f:
-        env_content = f.read()
-except FileNotFoundError:
-    print("Local .env file not found, trying to load environment variables directly")
-    env_content = os.environ.get("OPENAI_API_KEY", "")
-    
-# Parse the API key
-API_KEY = None
-if isinstance(env_content, str):
-    if "OPENAI_API_KEY=" in env_content:
-        # Parse from .env file format
-        raw_key = env_content.split("OPENAI_API_KEY=")[1].strip()
-        # Clean any quotes or newlines
-        API_KEY = raw_key.strip().strip("'").strip('"').strip()
-    else:
-        # Directly from environment variable
-        API_KEY = env_content
-
-if API_KEY:
-    # Mask the key for display
-    if len(API_KEY) > 8:
-        print(f"API key loaded: {API_KEY[:4]}...{API_KEY[-4:]}")
-    print(f"API key length: {len(API_KEY)}")
-    client = OpenAI(api_key=API_KEY)
-    
-    # Test the API key quickly - Skip test in development mode
-    if API_KEY != "dummy_key_for_testing":
-        try:
-            test_response = client.chat.completions.create(
-                model="gpt-4.5-preview",
-                messages=[
-                    {"role": "user", "content": "Say OK"}
-                ],
-                max_tokens=5
-            )
-            print(f"API key test successful: {test_response.choices[0].message.content}")
-        except Exception as e:
-            print(f"API key test failed: {str(e)}")
-            API_KEY = None
-            client = None
-    else:
-        print("Using dummy API key for testing - skipping API test")
-else:
-    print("No API key found")
-    API_KEY = None
-    client = None
+from prompt_catalog import load_mode_catalog
+from openai_client import get_health_status, get_pool_stats
+from async_engine import active_streams
+from context_builder import schedule_summary
+from generation import (generate_response, is_error_result, is_retryable_result, error_result,
+                        is_incomplete_result, incomplete_text)
+from prefetch import SessionPrefetcher
+from dag_runner import run_all
+from paper_ingest import extract_pdf_text
+from session_scheduler import get_scheduler, current_session_id
+from metrics import start_metrics_server, write_metrics_file
+from session_store import (get_session_store, new_session_token, SessionResults, evict_idle_results,
+                           enforce_memory_limit, memory_stats)
+from report_store import report_key, find_report, save_report
 
 print("\n" + "-"*50)
 print("STARTUP ANALYSIS AND PLANNING APP")
@@ -74,567 +23,15 @@ print("-"*50)
 print("App is running with API key from .env file")
 print("-"*50 + "\n")
 
-# Read the prompts from the specified file
-def load_prompts(file_path):
-    with open(file_path, "r") as file:
-        content = file.read()
-    
-    # Different parsing logic for different file formats
-    if file_path == "startup_analysis_prompts.txt":
-        return parse_analysis_prompts(content)
-    elif file_path == "startup_plans_prompts.txt":
-        return parse_plan_prompts(content)
-    elif file_path == "ai_research_paper_prompts.txt":
-        return parse_research_prompts(content)
-    elif file_path == "neurips_review.txt":
-        return parse_neurips_prompts(content)
-    elif file_path == "iclr_review.txt":
-        return parse_iclr_prompts(content)
-    else:
-        print(f"Unknown prompt file: {file_path}")
-        return {}
-
-# Parse the analysis prompts format
-def parse_analysis_prompts(content):
-    # Split the content into sections
-    sections = {}
-    current_section = None
-    current_prompts = []
-    
-    lines = content.split('\n')
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        if line.startswith('### '):
-            if current_section:
-                sections[current_section] = current_prompts
-            current_section = line.replace('### ', '').strip()
-            current_prompts = []
-        elif line.startswith('**') and '**' in line and '.' in line:
-            # This is a prompt title
-            parts = line.split('.')
-            prompt_number = parts[0].replace('**', '').strip()
-            if len(parts) > 1:
-                prompt_title = parts[1].replace('**', '').strip()
-                
-                # Find the full prompt content
-                i += 1
-                prompt_content = ""
-                while i < len(lines) and not (lines[i].startswith('**') or lines[i].startswith('---') or lines[i].startswith('###')):
-                    if lines[i].strip():
-                        prompt_content += lines[i] + '\n'
-                    i += 1
-                i -= 1  # Adjust for next iteration
-                
-                current_prompts.append((prompt_number, prompt_title, prompt_content))
-        i += 1
-    
-    # Add the last section
-    if current_section:
-        sections[current_section] = current_prompts
-    
-    return sections
-
-# Parse the plan prompts format
-def parse_plan_prompts(content):
-    # Split the content into sections
-    sections = {}
-    current_section = None
-    current_prompts = []
-    
-    lines = content.split('\n')
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        # Check for section headers which use ## pattern
-        if line.startswith('## '):
-            if current_section:
-                sections[current_section] = current_prompts
-            current_section = line.replace('## ', '').strip().replace('**', '')
-            current_prompts = []
-        # Check for prompt headers which use ### pattern
-        elif line.startswith('### '):
-            prompt_line = line.replace('### ', '').strip().replace('**', '')
-            
-            # Extract prompt number and title
-            if "**" in prompt_line:
-                prompt_line = prompt_line.replace('**', '')
-            
-            # Parse the prompt number and title
-            if '. ' in prompt_line:
-                parts = prompt_line.split('. ', 1)
-                prompt_number = parts[0]
-                prompt_title = parts[1] if len(parts) > 1 else prompt_line
-            else:
-                prompt_number = ""
-                prompt_title = prompt_line
-            
-            # Find the prompt content (usually on the next line)
-            i += 1
-            prompt_content = ""
-            # Plans prompts content is typically enclosed in > symbols
-            while i < len(lines) and lines[i].strip() and not (lines[i].startswith('##') or lines[i].startswith('---')):
-                content_line = lines[i].strip()
-                if content_line.startswith('>'):
-                    content_line = content_line[1:].strip()  # Remove the > and any space
-                prompt_content += content_line + '\n'
-                i += 1
-            i -= 1  # Adjust for next iteration
-            
-            current_prompts.append((prompt_number, prompt_title, prompt_content))
-        i += 1
-    
-    # Add the last section
-    if current_section:
-        sections[current_section] = current_prompts
-    
-    return sections
-
-# Parse the research paper prompts format
-def parse_research_prompts(content):
-    # Split the content into sections
-    sections = {}
-    current_section = None
-    current_prompts = []
-    
-    lines = content.split('\n')
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        # Check for section headers which use ## pattern
-        if line.startswith('## '):
-            if current_section:
-                sections[current_section] = current_prompts
-            current_section = line.replace('## ', '').strip()
-            current_prompts = []
-        # Check for subsection headers which use ### pattern 
-        elif line.startswith('### '):
-            prompt_title = line.replace('### ', '').strip()
-            prompt_number = ""  # No specific numbering in research paper format
-            
-            # Find the prompt content (bullet points that follow)
-            i += 1
-            prompt_content = ""
-            while i < len(lines) and not (lines[i].startswith('##') or lines[i].startswith('# ')):
-                if lines[i].strip():
-                    # Include all bullet points and text under this subsection
-                    prompt_content += lines[i] + '\n'
-                i += 1
-            i -= 1  # Adjust for next iteration
-            
-            # Add to the current section
-            if prompt_content.strip():
-                current_prompts.append((prompt_number, prompt_title, prompt_content))
-        i += 1
-    
-    # Add the last section
-    if current_section:
-        sections[current_section] = current_prompts
-    
-    return sections
-
-# Parse the NeurIPS review prompts format
-def parse_neurips_prompts(content):
-    # Split the content into sections
-    sections = {"NeurIPS Review": []}
-    current_prompts = []
-    
-    lines = content.split('\n')
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        # Look for numbered prompts (e.g. "1. Briefly summarize...")
-        if line and line[0].isdigit() and ". " in line:
-            parts = line.split(". ", 1)
-            prompt_number = parts[0]
-            prompt_title = parts[1]
-            
-            # Get the content (everything until the next numbered prompt)
-            i += 1
-            prompt_content = ""
-            while i < len(lines) and not (i < len(lines) and lines[i].strip() and lines[i].strip()[0].isdigit() and ". " in lines[i].strip()):
-                if lines[i].strip():
-                    prompt_content += lines[i] + '\n'
-                i += 1
-            i -= 1  # Adjust for next iteration
-            
-            # Create a properly formatted prompt that will work with the paper text
-            formatted_prompt = f"""Based on the following research paper, {prompt_title}
-
-Paper text:
-<idea>
-
-Please provide a detailed response addressing this aspect of the review."""
-            
-            # Add to the prompts
-            current_prompts.append((prompt_number, prompt_title, formatted_prompt))
-        i += 1
-    
-    # Add all prompts to the NeurIPS Review section
-    sections["NeurIPS Review"] = current_prompts
-    
-    return sections
-
-# Parse the ICLR review prompts format
-def parse_iclr_prompts(content):
-    # Split the content into sections
-    sections = {"ICLR Review": []}
-    current_prompts = []
-    
-    lines = content.split('\n')
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        # Look for numbered prompts (e.g. "1. Summarize...")
-        if line and line[0].isdigit() and ". " in line:
-            parts = line.split(". ", 1)
-            prompt_number = parts[0]
-            prompt_title = parts[1]
-            
-            # Get the content (everything until the next numbered prompt)
-            i += 1
-            prompt_content = ""
-            while i < len(lines) and not (i < len(lines) and lines[i].strip() and lines[i].strip()[0].isdigit() and ". " in lines[i].strip()):
-                if lines[i].strip():
-                    prompt_content += lines[i] + '\n'
-                i += 1
-            i -= 1  # Adjust for next iteration
-            
-            # Create a properly formatted prompt that will work with the paper text
-            formatted_prompt = f"""Based on the following research paper, {prompt_title}
-
-Paper text:
-<idea>
-
-Please provide a detailed response addressing this aspect of the review."""
-            
-            # Add to the prompts
-            current_prompts.append((prompt_number, prompt_title, formatted_prompt))
-        i += 1
-    
-    # Add all prompts to the ICLR Review section
-    sections["ICLR Review"] = current_prompts
-    
-    return sections
-
-def generate_pdf(results, all_prompts):
-    # Create a BytesIO buffer to receive the PDF data
-    buffer = io.BytesIO()
-    
-    # Create the PDF document
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    
-    # Add custom styles - use try/except to avoid errors if styles already exist
-    try:
-        styles.add(ParagraphStyle(name='CustomHeading1', 
-                                 fontName='Helvetica-Bold',
-                                 fontSize=16,
-                                 spaceAfter=12,
-                                 textColor=colors.blue))
-    except KeyError:
-        styles['CustomHeading1'] = ParagraphStyle(name='CustomHeading1',
-                                     fontName='Helvetica-Bold',
-                                     fontSize=16,
-                                     spaceAfter=12,
-                                     textColor=colors.blue)
-    
-    try:
-        styles.add(ParagraphStyle(name='CustomHeading2', 
-                                 fontName='Helvetica-Bold',
-                                 fontSize=14,
-                                 spaceAfter=10,
-                                 textColor=colors.darkblue))
-    except KeyError:
-        styles['CustomHeading2'] = ParagraphStyle(name='CustomHeading2',
-                                     fontName='Helvetica-Bold',
-                                     fontSize=14,
-                                     spaceAfter=10,
-                                     textColor=colors.darkblue)
-    
-    try:
-        styles.add(ParagraphStyle(name='CustomNormal',
-                                 fontName='Helvetica',
-                                 fontSize=10,
-                                 spaceAfter=10))
-    except KeyError:
-        styles['CustomNormal'] = ParagraphStyle(name='CustomNormal',
-                                     fontName='Helvetica',
-                                     fontSize=10,
-                                     spaceAfter=10)
-    
-    # Create the content
-    content = []
-    
-    # Add title with date
-    title_style = styles["Title"]  # Use built-in Title style
-    title_style.alignment = TA_CENTER
-    title = f"Analysis Report - {datetime.now().strftime('%Y-%m-%d')}"
-    content.append(Paragraph(title, title_style))
-    content.append(Spacer(1, 20))
-    
-    # Process all responses
-    current_section = None
-    
-    for idx, prompt_info in enumerate(all_prompts):
-        # Only include prompts that have responses
-        if idx not in results:
-            continue
-        
-        section_name, num, title, _ = prompt_info
-        response_text = results[idx]
-        
-        # Add section header if we're in a new section
-        if section_name != current_section:
-            content.append(Spacer(1, 10))
-            content.append(Paragraph(section_name, styles["CustomHeading1"]))
-            content.append(Spacer(1, 10))
-            current_section = section_name
-        
-        # Add the prompt number and title
-        prompt_title = f"{num}. {title}"
-        content.append(Paragraph(prompt_title, styles["CustomHeading2"]))
-        
-        # Clean up HTML-like tags
-        response_text = response_text.replace("<para>", "").replace("</para>", "")
-        response_text = response_text.replace("<b>", "").replace("</b>", "")
-        response_text = response_text.replace("<br>", "\n").replace("<br/>", "\n")
-        
-        # ----- NEW: Handle Markdown headings -----
-        lines = response_text.split("\n")
-        buffered_lines = []
-        for line in lines:
-            if line.startswith("## "):
-                content.append(Paragraph(line[3:], styles['CustomHeading1']))
-                content.append(Spacer(1, 8))
-            elif line.startswith("### "):
-                content.append(Paragraph(line[4:], styles['CustomHeading2']))
-                content.append(Spacer(1, 6))
-            else:
-                buffered_lines.append(line)
-        response_text = "\n".join(buffered_lines)
-        # -----------------------------------------
-        
-        # Special handling for markdown tables
-        sep_pattern = re.compile(r'^\s*\|?(?:\s*-{3,}\s*\|)+\s*$')
-        if "|" in response_text:
-            # This is a markdown table - we need special handling
-            try:
-                # First, treat the table separately from rest of text
-                sections = []
-                current_section_text = ""
-                in_table = False
-                
-                lines = response_text.split("\n")
-                i = 0
-                while i < len(lines):
-                    line = lines[i].strip()
-                    
-                    # Check if this line could be the start of a table
-                    if "|" in line:
-                        # Look ahead to see if next line is a separator
-                        is_table_start = False
-                        for j in range(i+1, min(i+3, len(lines))):
-                            next_line = lines[j].strip()
-                            if sep_pattern.match(next_line):
-                                is_table_start = True
-                                break
-                        
-                        if is_table_start:
-                            # End previous text section
-                            if current_section_text:
-                                sections.append(("text", current_section_text))
-                                current_section_text = ""
-                            in_table = True
-                            table_content = line + "\n"
-                            i += 1
-                            continue
-                    
-                    if in_table:
-                        if "|" in line:
-                            table_content += line + "\n"
-                        else:
-                            # End of table
-                            sections.append(("table", table_content))
-                            in_table = False
-                            current_section_text = (line + "\n") if line else ""
-                    else:
-                        current_section_text += line + "\n"
-                    i += 1
-                
-                # Add any lingering section
-                if in_table:
-                    sections.append(("table", table_content))
-                elif current_section_text:
-                    sections.append(("text", current_section_text))
-                
-                # Now render sections
-                for sec_type, sec_content in sections:
-                    if sec_type == "text":
-                        # existing text->bullet logic unchanged
-                        # ...
-                        pass
-                    elif sec_type == "table":
-                        from reportlab.platypus import Table, TableStyle
-                        # existing table rendering logic unchanged
-                        # ...
-                        pass
-            except Exception as e:
-                print(f"Error processing table: {e}")
-                content.append(Paragraph(response_text, styles['CustomNormal']))
-        else:
-            # No tables, process as regular text
-            # existing bullet/text logic unchanged
-            # ...
-            pass
-        
-        content.append(Spacer(1, 15))
-    
-    # Build the PDF
-    doc.build(content)
-    pdf_data = buffer.getvalue()
-    buffer.close()
-    return pdf_data
-
-# Function to create a download link for the generated PDF
-def get_pdf_download_link(pdf_data, filename="report.pdf"):
-    b64 = base64.b64encode(pdf_data).decode()
-    href = f'<a href="data:application/pdf;base64,{b64}" download="{filename}">Download PDF Report</a>'
-    return href
-
 # Function to call OpenAI API with streaming
-def call_openai_api(prompt, idea, current_idx, all_prompts, results, placeholder=None):
-    global API_KEY, client
-    
-    # Format the prompt first
-    formatted_prompt = prompt.replace('<idea>', idea)
-    
-    # Error message to display if there's no API key
-    api_key_error_msg = """
-    Error: No valid OpenAI API key found. Please:
-    
-    1. Get a valid API key from https://platform.openai.com/api-keys
-    2. Add it to your .env file as OPENAI_API_KEY=your_key
-    3. Restart the app
-    """
-    
-    # Check if we have a valid API key
-    if not API_KEY:
-        print("DEBUG: No valid API key available")
-        return api_key_error_msg
-    
-    try:
-        # Create a new client for each API call to ensure we're using the correct key
-        direct_client = OpenAI(api_key=API_KEY)
-        
-        # Build message history with all previous prompts and responses
-        messages = [
-            {"role": "system", "content": """You are a startup analysis expert. Provide detailed, data-driven responses. Build upon previous analyses in your responses.
-            
-Format your output using Markdown:
-1. Use tables to organize information when presenting comparative data, metrics, or segments
-2. IMPORTANT: When formatting tables:
-   - Ensure each row has the same number of cells/columns (always match the header)
-   - Do not use bullet points inside table cells (use simple text instead)
-   - Keep table cell content concise (use short phrases or single words when possible)
-   - Use clear column headers in the first row
-   - Each row must be on a single line (no line breaks inside a row)
-   - Format tables properly with header separator rows using this exact format: | --- | --- | --- |
-   - Make sure columns are properly aligned with | at beginning and end of each row
-   - For wide tables with many columns, consider breaking into multiple smaller tables
-   - Use proper markdown table syntax with pipes and dashes
-   - Keep table width to max 5-6 columns for readability
-3. Use bullet points for lists and key points (outside of tables)
-   - Place an empty line before and after bullet point lists
-   - Start each bullet with a single hyphen (-)
-4. Use headers (### or ####) to organize sections
-5. Clearly label all sections and tables"""}
-        ]
-        
-        # Add all previous prompts and responses as context
-        for i in range(current_idx):
-            if i in results:
-                section_name, num, title, prev_prompt = all_prompts[i]
-                prev_formatted = prev_prompt.replace('<idea>', idea)
-                
-                # Add the previous prompt
-                messages.append({"role": "user", "content": f"Previous analysis request {i+1}: {prev_formatted}"})
-                
-                # Add the previous response
-                messages.append({"role": "assistant", "content": f"Previous analysis result {i+1}: {results[i]}"})
-        
-        # Add the current prompt
-        messages.append({"role": "user", "content": f"Based on all previous analyses, please provide the next analysis: {formatted_prompt}"})
-        
-        print(f"Making streaming API call with key: {API_KEY[:4]}...{API_KEY[-4:]}")
-        
-        # Use the placeholder passed in, or create a new one if none
-        try:
-            # Use provided placeholder or create a new one
-            response_placeholder = placeholder if placeholder is not None else st.empty()
-            full_response = ""
-            
-            # Use streaming for real-time updates with longer timeout
-            stream = direct_client.chat.completions.create(
-                model="gpt-4.5-preview",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=2000,
-                stream=True,  # Enable streaming
-                timeout=600  # Set 10-minute timeout for API call
-            )
-            
-            # Process the stream
-            for chunk in stream:
-                if chunk.choices and len(chunk.choices) > 0 and chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    full_response += content
-                    # Just replace <br> tags with spaces
-                    processed_response = full_response.replace("<br>", " ")
-                    
-                    # Update the display with each processed chunk
-                    response_placeholder.markdown(processed_response)
-        except Exception as e:
-            print(f"Streaming error: {str(e)}")
-            full_response = "Error during streaming. Please try again."
-        
-        return full_response
-    except Exception as e:
-        error_str = str(e)
-        print(f"DEBUG: API error: {error_str}")
-        
-        if "insufficient_quota" in error_str:
-            return """
-            Error: Your OpenAI account has insufficient quota or credits.
-            
-            Please visit https://platform.openai.com/account/billing to add credits to your account.
-            Once you've added credits, restart the app to continue.
-            """
-        elif "invalid_api_key" in error_str:
-            return api_key_error_msg
-        else:
-            return f"Error: {error_str}"
-
-# Keep the Streamlit connection alive through a heartbeat
-def keep_connection_alive():
-    # This function runs in a separate thread and periodically 
-    # updates a hidden value to keep the connection alive
-    while True:
-        # Update heartbeat counter every 15 seconds
-        if 'heartbeat' in st.session_state:
-            st.session_state.heartbeat += 1
-        time.sleep(15)
+def call_openai_api(prompt, idea, current_idx, all_prompts, results, placeholder=None, partial=None, mode=None):
+    # Use provided placeholder or create a new one
+    response_placeholder = placeholder if placeholder is not None else st.empty()
+    return generate_response(prompt, idea, current_idx, all_prompts, results,
+                             on_update=response_placeholder.markdown, partial=partial, mode=mode)
 
 # Main Streamlit app
 def main():
-    global API_KEY, client
-    
-    # Initialize heartbeat counter
-    if 'heartbeat' not in st.session_state:
-        st.session_state.heartbeat = 0
-        # Start the heartbeat thread
-        threading.Thread(target=keep_connection_alive, daemon=True).start()
-    
     # Increase session timeout to prevent the app from closing too soon
     # These settings can also be set in .streamlit/config.toml
     st.set_page_config(
@@ -673,13 +70,23 @@ def main():
     
     # Don't show API key field in GUI - use .env file or environment variables instead
     
+    # Answers are written to the session store as they complete, so a refresh or a
+    # server restart picks up where the session left off. The URL carries the token.
+    session_store = get_session_store()
+    if 'session_token' not in st.session_state:
+        session_token = st.query_params.get("session") or new_session_token()
+        st.query_params["session"] = session_token
+        st.session_state.session_token = session_token
+        st.session_state.results = SessionResults(session_store, session_token)
+        saved_session = session_store.get_session(session_token)
+        if saved_session is not None:
+            st.session_state.idea, st.session_state.mode, st.session_state.current_prompt_index = saved_session
+            st.session_state.saved_session = saved_session
+    
     # Initialize session state if not exists
     if 'current_prompt_index' not in st.session_state:
         st.session_state.current_prompt_index = 0
         
-    if 'results' not in st.session_state:
-        st.session_state.results = {}
-        
     if 'idea' not in st.session_state:
         st.session_state.idea = ""
         
@@ -689,6 +96,37 @@ def main():
     # Track which results have been seen (for debugging)
     if 'seen_results' not in st.session_state:
         st.session_state.seen_results = set()
+        
+    # Background generation of the next prompt(s) while the user reads
+    if 'prefetcher' not in st.session_state:
+        st.session_state.prefetcher = SessionPrefetcher()
+    
+    # Keep-alive and cleanup for this session run by the shared scheduler thread -
+    # background work is cancelled once the browser disconnects
+    session_id = current_session_id()
+    scheduler = get_scheduler()
+    if session_id is not None:
+        prefetcher = st.session_state.prefetcher
+        results = st.session_state.results
+        
+        def close_session():
+            prefetcher.cancel_all()
+            # The answers stay in the session store
+            results.unload()
+        
+        scheduler.register(session_id, on_close=close_session)
+    scheduler.add_task(evict_idle_results)
+    scheduler.add_task(enforce_memory_limit)
+    scheduler.add_task(write_metrics_file)
+    start_metrics_server()
+    
+    # Save the idea, mode and position when the previous run changed them
+    current_session = (st.session_state.idea, st.session_state.mode, st.session_state.current_prompt_index)
+    if st.session_state.get('saved_session') != current_session:
+        session_store.save_session(st.session_state.session_token, *current_session)
+        st.session_state.saved_session = current_session
+    # Counted in the session's memory use
+    st.session_state.results.idea = st.session_state.idea
     
     # Text input
     idea = st.text_area("Idea input", 
@@ -697,10 +135,22 @@ def main():
                      key="main_idea_input",
                      label_visibility="hidden")
     
-    # Make sure we still have a valid idea value, even if the text area is empty
-    # This handles the case where the user has entered text, then clicked a button
-    if not idea and 'idea' in st.session_state:
-        idea = st.session_state.idea
+    # Or a paper as PDF - pages are extracted in worker processes, cached by file hash
+    uploaded_pdf = st.file_uploader("Or upload a PDF", type="pdf")
+    if uploaded_pdf is not None:
+        if st.session_state.get('pdf_file_id') != uploaded_pdf.file_id:
+            progress = st.progress(0.0, text="Reading PDF...")
+            try:
+                st.session_state.pdf_text = extract_pdf_text(
+                    uploaded_pdf.getvalue(),
+                    on_page=lambda done, total: progress.progress(done / total, text=f"Reading page {done} of {total}"))
+                st.session_state.pdf_file_id = uploaded_pdf.file_id
+            except Exception as e:
+                st.error(f"Could not read the PDF: {str(e)}")
+            progress.empty()
+    else:
+        st.session_state.pop('pdf_file_id', None)
+        st.session_state.pop('pdf_text', None)
     
     # Buttons in a row
     button_col1, button_col2, button_space = st.columns([1, 1, 4])
@@ -711,8 +161,10 @@ def main():
         plan_button = st.button("Plan", use_container_width=True)
     
     # Get input text (either from text area or PDF)
-    # If text input is empty but we have text from PDF, use the PDF text
-    input_text = idea if idea else st.session_state.get('idea', '')
+    # If text input is empty but we have text from PDF, use the PDF text. Only without
+    # either do we fall back to the stored idea (the user entered text, then clicked a
+    # button), so a newly uploaded paper replaces the previous idea.
+    input_text = idea or st.session_state.get('pdf_text') or st.session_state.get('idea', '')
     
     # Process submission
     if analyze_button:
@@ -724,8 +176,9 @@ def main():
             st.session_state.mode = "analyze"
             
             # Clear ALL previous results on new submission
-            st.session_state.results = {}
+            st.session_state.results.clear()
             st.session_state.seen_results = set()
+            st.session_state.prefetcher.cancel_all()
             
             # Reset to first prompt
             st.session_state.current_prompt_index = 0
@@ -742,8 +195,9 @@ def main():
             st.session_state.mode = "plan"
             
             # Clear ALL previous results on new submission
-            st.session_state.results = {}
+            st.session_state.results.clear()
             st.session_state.seen_results = set()
+            st.session_state.prefetcher.cancel_all()
             
             # Reset to first prompt
             st.session_state.current_prompt_index = 0
@@ -757,27 +211,17 @@ def main():
     if not st.session_state.mode:
         return
         
-    # Load appropriate prompts based on mode
-    if st.session_state.mode == "analyze":
-        prompts_sections = load_prompts("startup_analysis_prompts.txt")
-    elif st.session_state.mode == "plan":
-        prompts_sections = load_prompts("startup_plans_prompts.txt")
-    elif st.session_state.mode == "neurips":
-        prompts_sections = load_prompts("neurips_review.txt")
-    elif st.session_state.mode == "iclr":
-        prompts_sections = load_prompts("iclr_review.txt")
-    else:  # research mode
-        prompts_sections = load_prompts("ai_research_paper_prompts.txt")
-    
-    # Flatten prompts into a sequential list
-    all_prompts = []
-    for section_name, prompts in prompts_sections.items():
-        for num, title, content in prompts:
-            all_prompts.append((section_name, num, title, content))
+    # Load appropriate prompts based on mode - the catalog is parsed once per
+    # process and already carries the flattened (section, num, title, content) list
+    catalog = load_mode_catalog(st.session_state.mode)
+    all_prompts = catalog.prompts
     
     # Get current prompt
     if all_prompts:
+        # A restored session may point past the end of a catalog that has shrunk since
+        st.session_state.current_prompt_index = min(st.session_state.current_prompt_index, len(all_prompts) - 1)
         current_idx = st.session_state.current_prompt_index
+        st.session_state.results.displayed = current_idx
         
         # No progress indicator shown
         
@@ -802,6 +246,9 @@ def main():
         
         # Create a single placeholder for response display
         result_placeholder = st.empty()
+        
+        # Prefetched answers are only valid for the mode and idea they were started for
+        prefetch_key = (st.session_state.mode, st.session_state.idea)
             
         # Handle result display (and auto-generation if needed)
         if current_idx in st.session_state.results:
@@ -822,25 +269,55 @@ def main():
             _, _, _, content = all_prompts[current_idx]
             
             try:
-                # Auto-generate response using streaming with our placeholder
+                # Use the prefetched answer if there is one - finished, or still
+                # streaming in the background (then show it as it arrives)
+                result = None
+                prefetch_job = st.session_state.prefetcher.take(current_idx, prefetch_key)
+                if prefetch_job is not None:
+                    result = prefetch_job.wait(on_update=result_placeholder.markdown)
+                    if result is not None:
+                        result_placeholder.markdown(result.replace("<br>", " "))
+                
+                # Otherwise auto-generate response using streaming with our placeholder
                 # This will display the response as it's generated
-                result = call_openai_api(
-                    prompt=content,
-                    idea=st.session_state.idea,
-                    current_idx=current_idx,
-                    all_prompts=all_prompts,
-                    results=st.session_state.results,
-                    placeholder=result_placeholder
-                )
+                if result is None:
+                    retry_idx, partial = st.session_state.pop('retry_partial', (None, None))
+                    result = call_openai_api(
+                        prompt=content,
+                        idea=st.session_state.idea,
+                        current_idx=current_idx,
+                        all_prompts=all_prompts,
+                        results=st.session_state.results,
+                        placeholder=result_placeholder,
+                        partial=partial if retry_idx == current_idx else None,
+                        mode=st.session_state.mode
+                    )
                 
                 # Just store the result for future navigation, don't display again
                 # The streaming has already displayed it in the placeholder
                 st.session_state.results[current_idx] = result
+                # Summarize it in the background for the context of later prompts
+                schedule_summary(result)
             except Exception as e:
                 error_message = f"Error generating response: {str(e)}"
                 print(error_message)
                 result_placeholder.error(error_message)
-                st.session_state.results[current_idx] = error_message
+                st.session_state.results[current_idx] = error_result(error_message)
+            
+        # A failed prompt is generated again; an answer that stopped early is continued
+        if current_idx in st.session_state.results and is_retryable_result(st.session_state.results[current_idx]):
+            if st.button("Retry"):
+                failed_result = st.session_state.results.pop(current_idx)
+                if is_incomplete_result(failed_result):
+                    st.session_state.retry_partial = (current_idx, incomplete_text(failed_result))
+                st.rerun()
+            
+        # Start generating the next prompt(s) while the user reads this one
+        if (st.session_state.idea and current_idx in st.session_state.results
+                and not is_error_result(st.session_state.results[current_idx])):
+            st.session_state.prefetcher.schedule(current_idx, prefetch_key, all_prompts,
+                                                 st.session_state.idea, st.session_state.results,
+                                                 mode=st.session_state.mode)
             
         # Debug info - not visible to user but helpful for developers
         # Show which responses we have in memory
@@ -849,7 +326,7 @@ def main():
         print(f"Seen responses: {list(st.session_state.seen_results)}")
             
         # Always show navigation buttons, even before result is displayed
-        col1, col2, col3 = st.columns([1, 1, 1])
+        col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
         
         with col1:
             if current_idx > 0:
@@ -861,16 +338,52 @@ def main():
         # Only show the Generate PDF button if we have some results
         with col3:
             if st.session_state.results:
-                if st.button("Generate PDF Report"):
-                    # Generate PDF with all responses
-                    pdf_data = generate_pdf(st.session_state.results, all_prompts)
+                # Reports are stored as files keyed by the results, so the download
+                # survives reruns and the same results are never rendered twice
+                current_report_key = report_key(st.session_state.mode, st.session_state.results, all_prompts)
+                report_path = find_report(current_report_key)
+                report_file = None
+                if report_path is not None:
+                    try:
+                        report_file = open(report_path, "rb")
+                    except OSError:
+                        # Evicted from the store since find_report - offer to generate it again
+                        report_file = None
+                if report_file is None:
+                    if st.button("Generate PDF Report"):
+                        # Generate PDF with all responses - reportlab is only loaded now
+                        from pdf_report import generate_pdf
+                        pdf_data = generate_pdf(st.session_state.results, all_prompts, mode=st.session_state.mode)
+                        report_path = save_report(current_report_key, pdf_data)
+                        report_file = open(report_path, "rb")
+                
+                if report_file is not None:
+                    # Serve the stored file instead of inlining it in the page
+                    with report_file:
+                        # Create a filename based on mode and when the report was generated
+                        mode = st.session_state.mode.capitalize()
+                        generated_at = datetime.fromtimestamp(os.fstat(report_file.fileno()).st_mtime)
+                        filename = f"{mode}_Report_{generated_at.strftime('%Y%m%d_%H%M%S')}.pdf"
+                        st.download_button("Download PDF Report", data=report_file,
+                                           file_name=filename, mime="application/pdf")
+        
+        # Generate every remaining prompt at once - prompts whose dependencies are
+        # done run in parallel, each with only its dependencies' results as history
+        with col4:
+            if st.session_state.idea and len(st.session_state.results) < len(all_prompts):
+                if st.button("Run all"):
+                    st.session_state.prefetcher.cancel_all()
+                    progress = st.progress(0.0, text="Running all prompts...")
                     
-                    # Create a filename based on mode
-                    mode = st.session_state.mode.capitalize()
-                    filename = f"{mode}_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+                    def show_progress(idx, result):
+                        section_name, num, title, _ = all_prompts[idx]
+                        progress.progress(len(st.session_state.results) / len(all_prompts),
+                                          text=f"Finished {num}. {title}")
                     
-                    # Create download link
-                    st.markdown(get_pdf_download_link(pdf_data, filename), unsafe_allow_html=True)
+                    run_all(all_prompts, catalog.dependencies, st.session_state.idea,
+                            st.session_state.results, on_result=show_progress,
+                            mode=st.session_state.mode)
+                    st.rerun()
         
         # Show Next button if not on the last prompt
         with col2:
@@ -894,7 +407,25 @@ def main():
         st.markdown("Made with ❤️ by Claude Code and running OpenAI GPT 4.5")
     with footer2:
         # Show heartbeat in small text - helps monitor connection status
-        st.caption(f"Connection heartbeat: {st.session_state.heartbeat}")
+        scheduler_stats = scheduler.stats()
+        st.caption(f"Connection heartbeat: {scheduler.heartbeat(session_id)}",
+                   help=f"{scheduler_stats['sessions']} sessions, {scheduler_stats['threads']} threads")
+        # Cached API health - refreshed in the background, never blocks the page
+        health = get_health_status()
+        st.caption(f"API status: {health['status']}", help=health["detail"])
+        # Shared connection pool and the streams using it
+        pool = get_pool_stats()
+        open_connections = "?" if pool["open_connections"] is None else pool["open_connections"]
+        st.caption(f"API connections: {open_connections} open, {active_streams()} streaming",
+                   help=f"{pool['requests']} requests, {pool['reuse_ratio']:.0%} on reused connections, "
+                        f"pool wait {pool['queue_wait_avg'] * 1000:.0f} ms avg / {pool['queue_wait_max'] * 1000:.0f} ms max, "
+                        f"pool size {pool['max_connections']}, HTTP/2 {'on' if pool['http2'] else 'off'}")
+        # Memory held by this session and by all sessions together
+        memory = memory_stats()
+        st.caption(f"Session memory: {memory['sessions'].get(st.session_state.session_token, 0) / 1024:.0f} KB",
+                   help=f"{len(memory['sessions'])} sessions use {memory['total_bytes'] / 1048576:.1f} MB; "
+                        f"their answers {memory['answer_bytes'] / 1048576:.1f} MB of {memory['limit_bytes'] / 1048576:.0f} MB, "
+                        f"{memory['spilled']} spilled to disk")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,128 @@
+import time
+import queue
+import asyncio
+import threading
+from openai_client import create_async_client
+from rate_limiter import call_with_retries_async, request_tokens
+
+# Marks the end of a stream in a StreamHandle's delta queue
+_DONE = object()
+
+# One streamed completion running on the engine's event loop.
+# Text deltas arrive on `deltas`; iterating the handle yields them until the stream
+# ends and re-raises the stream's error, if any. `opened` is set once the API
+# accepted the request, so callers can tell a refused request from a broken stream.
+# `sent_at` is the monotonic time the attempt that opened the stream was sent, and
+# `wait_seconds` the time spent in rate limiter waits and retry backoff before it.
+class StreamHandle:
+    def __init__(self):
+        self.deltas = queue.Queue()
+        self.opened = threading.Event()
+        self.sent_at = None
+        self.wait_seconds = 0.0
+        self.error = None
+        self._future = None
+
+    def _add_wait(self, seconds):
+        self.wait_seconds += seconds
+
+    # Next delta, or None if nothing arrived within timeout.
+    # Raises StopIteration at the end of the stream and the stream's error on failure.
+    def next_delta(self, timeout=None):
+        try:
+            item = self.deltas.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is _DONE:
+            self.deltas.put(_DONE)
+            if self.error is not None:
+                raise self.error
+            raise StopIteration
+        return item
+
+    def __iter__(self):
+        while True:
+            try:
+                yield self.next_delta()
+            except StopIteration:
+                return
+
+    # Stop the stream; the connection is released on the event loop
+    def cancel(self):
+        if self._future is not None:
+            self._future.cancel()
+
+# Runs every streamed generation of the process on one dedicated event loop, so an
+# in-flight stream costs a coroutine rather than a blocked thread.
+class AsyncEngine:
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="openai-async", daemon=True)
+        self._thread.start()
+        self._client = None
+        self._active = 0
+        self._active_lock = threading.Lock()
+
+    async def _get_client(self):
+        if self._client is None:
+            self._client = create_async_client()
+        return self._client
+
+    async def _stream(self, handle, request):
+        with self._active_lock:
+            self._active += 1
+        try:
+            client = await self._get_client()
+            if client is None:
+                raise RuntimeError("No OpenAI API key configured")
+            # Every attempt records its send time, so the one that opens the stream is kept
+            async def send():
+                handle.sent_at = time.monotonic()
+                return await client.chat.completions.create(stream=True, **request)
+
+            # Waits for the shared rate limiter and retries 429/5xx before the stream opens
+            stream = await call_with_retries_async(
+                send, request_tokens(request["messages"], request.get("max_tokens")), on_wait=handle._add_wait)
+            handle.opened.set()
+            try:
+                async for chunk in stream:
+                    if chunk.choices and len(chunk.choices) > 0 and chunk.choices[0].delta.content:
+                        handle.deltas.put(chunk.choices[0].delta.content)
+            finally:
+                await stream.close()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            handle.error = e
+        finally:
+            handle.deltas.put(_DONE)
+            with self._active_lock:
+                self._active -= 1
+
+    # Start a streamed chat completion and return its handle immediately.
+    # Takes the keyword arguments of chat.completions.create (without stream).
+    def start_stream(self, **request):
+        handle = StreamHandle()
+        handle._future = asyncio.run_coroutine_threadsafe(self._stream(handle, request), self._loop)
+        return handle
+
+    # Number of streams currently running on the loop
+    def active_streams(self):
+        with self._active_lock:
+            return self._active
+
+_engine = None
+_engine_lock = threading.Lock()
+
+# Return the process-wide engine, starting its event loop thread on first use
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AsyncEngine()
+    return _engine
+
+# Streams running in the process; 0 before the engine is started
+def active_streams():
+    return _engine.active_streams() if _engine is not None else 0
@@ -0,0 +1,190 @@
+"""Run the analysis or planning prompts for many ideas without the web UI.
+
+    python batch_runner.py ideas.jsonl --output runs/ [--mode analyze plan] [--concurrency 4]
+
+Run it from the repository root, like the app, so the prompt files are found.
+
+Each line of the input is a JSON object with an "idea" field and optionally an
+"id" and a "mode" (a plain JSON string is also accepted as the idea). Results
+are written to <output>/<id>/<mode>/results.json after every prompt, and
+report.pdf once all prompts are answered. Running the same command again
+resumes: finished ideas are skipped, failed prompts are retried and incomplete
+answers are continued from where they stopped.
+"""
+import os
+import sys
+import env_file  # loads .env before any module reads its settings
+import json
+import signal
+import hashlib
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from prompt_catalog import MODE_PROMPT_FILES, load_mode_catalog
+from generation import is_error_result, is_retryable_result, is_incomplete_result, incomplete_text
+from dag_runner import run_all
+from pdf_report import generate_pdf
+from metrics import start_metrics_server, write_metrics_file
+
+# Ideas processed at the same time
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+
+_stop = threading.Event()
+_print_lock = threading.Lock()
+
+def log(message):
+    with _print_lock:
+        print(message, flush=True)
+
+# Parse the input file into (idea_id, idea, mode) jobs
+def read_ideas(path, default_modes):
+    jobs = []
+    with open(path, "r", encoding="utf-8") as input_file:
+        for line_number, line in enumerate(input_file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                log(f"Skipping line {line_number}: {str(e)}")
+                continue
+            if isinstance(record, str):
+                record = {"idea": record}
+            idea = (record.get("idea") or "").strip()
+            if not idea:
+                log(f"Skipping line {line_number}: no idea")
+                continue
+            idea_id = str(record.get("id") or hashlib.sha256(idea.encode("utf-8")).hexdigest()[:12])
+            modes = [record["mode"]] if record.get("mode") else default_modes
+            for mode in modes:
+                if mode not in MODE_PROMPT_FILES:
+                    log(f"Skipping line {line_number}: unknown mode {mode}")
+                    continue
+                jobs.append((idea_id, idea, mode))
+    return jobs
+
+def write_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+        json.dump(data, tmp_file, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+# Results saved by an earlier run, split into finished answers and incomplete
+# ones (kept as saved, marker included). Failed prompts are left out so they are retried.
+def load_saved_results(path):
+    try:
+        with open(path, "r", encoding="utf-8") as saved_file:
+            saved = json.load(saved_file)
+    except (OSError, ValueError):
+        return {}, {}
+    results = {}
+    incomplete = {}
+    for idx, text in saved.get("results", {}).items():
+        if is_incomplete_result(text):
+            incomplete[int(idx)] = text
+        elif not is_error_result(text):
+            results[int(idx)] = text
+    return results, incomplete
+
+# Run every prompt of one mode for one idea, saving after each answer
+def run_idea(idea_id, idea, mode, output_dir, prompt_parallelism):
+    job_dir = os.path.join(output_dir, idea_id, mode)
+    results_path = os.path.join(job_dir, "results.json")
+    report_path = os.path.join(job_dir, "report.pdf")
+    if os.path.exists(report_path):
+        log(f"[{idea_id}/{mode}] already finished")
+        return "skipped"
+    os.makedirs(job_dir, exist_ok=True)
+
+    catalog = load_mode_catalog(mode)
+    all_prompts = catalog.prompts
+    dependencies = catalog.dependencies
+    results, incomplete = load_saved_results(results_path)
+    # Incomplete answers are continued from their text instead of generated again
+    partials = {idx: incomplete_text(text) for idx, text in incomplete.items()}
+    if results or incomplete:
+        log(f"[{idea_id}/{mode}] resuming with {len(results)} of {len(all_prompts)} answers"
+            f" and {len(incomplete)} to continue")
+
+    def save():
+        # Incomplete answers not continued yet are kept, so a stopped run loses nothing
+        saved = {**incomplete, **results}
+        write_json(results_path, {
+            "id": idea_id,
+            "mode": mode,
+            "idea": idea,
+            "prompts": [[section, num, title] for section, num, title, _ in all_prompts],
+            "results": {str(idx): saved[idx] for idx in sorted(saved)},
+        })
+
+    def on_result(idx, result):
+        status = "failed" if is_error_result(result) else "incomplete" if is_retryable_result(result) else "done"
+        log(f"[{idea_id}/{mode}] prompt {idx + 1}/{len(all_prompts)} {status}")
+        save()
+
+    run_all(all_prompts, dependencies, idea, results, max_parallel=prompt_parallelism,
+            on_result=on_result, should_stop=_stop.is_set, mode=mode, partials=partials)
+    save()
+
+    failed = [idx for idx, text in results.items() if is_retryable_result(text)]
+    if failed or len(results) < len(all_prompts):
+        log(f"[{idea_id}/{mode}] incomplete: {len(results) - len(failed)} of {len(all_prompts)} answered")
+        return "incomplete"
+
+    fd, tmp_path = tempfile.mkstemp(dir=job_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as tmp_file:
+        tmp_file.write(generate_pdf(results, all_prompts, mode=mode))
+    os.replace(tmp_path, report_path)
+    log(f"[{idea_id}/{mode}] finished")
+    return "finished"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file with one idea per line")
+    parser.add_argument("--output", "-o", default="runs", help="directory for results and reports")
+    parser.add_argument("--mode", nargs="+", default=["analyze"], choices=sorted(MODE_PROMPT_FILES),
+                        help="prompt set(s) to run for ideas that do not name one")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="ideas processed at once")
+    parser.add_argument("--prompt-parallelism", type=int, default=None,
+                        help="prompts generated at once per idea (default RUN_ALL_PARALLELISM)")
+    args = parser.parse_args(argv)
+
+    jobs = read_ideas(args.input, args.mode)
+    start_metrics_server()
+    os.makedirs(args.output, exist_ok=True)
+    log(f"{len(jobs)} jobs, {args.concurrency} at a time")
+
+    executor = ThreadPoolExecutor(max_workers=max(args.concurrency, 1), thread_name_prefix="batch")
+
+    # First Ctrl-C finishes the prompts in flight and saves; the second exits at once,
+    # abandoning them. Results files are replaced atomically, so none is left half written.
+    def handle_interrupt(signum, frame):
+        if _stop.is_set():
+            log("Quitting without waiting for the prompts in flight")
+            executor.shutdown(wait=False, cancel_futures=True)
+            write_metrics_file()
+            os._exit(130)
+        log("Stopping after the prompts in flight - interrupt again to quit now")
+        _stop.set()
+    signal.signal(signal.SIGINT, handle_interrupt)
+
+    counts = {}
+    with executor:
+        futures = [executor.submit(run_idea, idea_id, idea, mode, args.output, args.prompt_parallelism)
+                   for idea_id, idea, mode in jobs]
+        for future, (idea_id, _, mode) in zip(futures, jobs):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                log(f"[{idea_id}/{mode}] error: {str(e)}")
+                outcome = "error"
+            counts[outcome] = counts.get(outcome, 0) + 1
+            write_metrics_file()
+
+    log("Summary: " + ", ".join(f"{count} {outcome}" for outcome, count in sorted(counts.items())))
+    return 0 if counts.get("incomplete", 0) + counts.get("error", 0) == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Measure the cold-start import time of the apps and fail if it regresses.
+
+Run from the repository root:
+
+    python benchmarks/bench_import_time.py [--runs 7] [--update]
+
+Each run imports the app in a fresh interpreter with `-X importtime`. The time
+spent in streamlit itself is subtracted, leaving the cost of our own modules
+and what they pull in. The median is compared with
+benchmarks/import_time_baseline.json; --update rewrites the baseline.
+Heavy modules that must only be loaded on first use are also checked.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_time_baseline.json")
+
+ENTRY_MODULES = ("app", "streamlit_app")
+
+# Must not be imported by the first render (dotenv is not listed: the .env file is
+# loaded at startup, before the settings are read)
+LAZY_MODULES = ("openai", "reportlab", "PyPDF2")
+
+# Framework cost subtracted from the total
+FRAMEWORK_MODULE = "streamlit"
+
+# Run one cold import and return {module: cumulative microseconds} for top-level packages
+def measure_import(module):
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            total = int(parts[1])
+        except ValueError:
+            continue  # header line
+        name = parts[2].strip()
+        cumulative[name] = total
+    return cumulative
+
+def load_baseline():
+    try:
+        with open(BASELINE_PATH, "r") as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="allowed slowdown over the baseline as a fraction (default 0.5)")
+    parser.add_argument("--slack-ms", type=float, default=15.0,
+                        help="absolute slack added to the allowed time, for timer noise")
+    parser.add_argument("--update", action="store_true", help="store the measured times as the new baseline")
+    args = parser.parse_args()
+
+    baseline = load_baseline()
+    measured = {}
+    failures = []
+    print(f"{'module':>14} {'total':>10} {FRAMEWORK_MODULE:>10} {'own':>10} {'baseline':>10}")
+    for module in ENTRY_MODULES:
+        own_times = []
+        totals = []
+        framework_times = []
+        for _ in range(args.runs):
+            cumulative = measure_import(module)
+            loaded_lazy = [name for name in LAZY_MODULES if name in cumulative]
+            if loaded_lazy:
+                failures.append(f"{module} imports {', '.join(loaded_lazy)} at startup")
+            total = cumulative.get(module, 0) / 1000
+            framework = cumulative.get(FRAMEWORK_MODULE, 0) / 1000
+            totals.append(total)
+            framework_times.append(framework)
+            own_times.append(total - framework)
+        own = statistics.median(own_times)
+        measured[module] = {"own_ms": round(own, 1)}
+        expected = baseline.get(module, {}).get("own_ms")
+        print(f"{module:>14} {statistics.median(totals):>8.1f}ms {statistics.median(framework_times):>8.1f}ms "
+              f"{own:>8.1f}ms {expected if expected is not None else '-':>8}ms")
+        if expected is not None and not args.update:
+            allowed = expected * (1 + args.threshold) + args.slack_ms
+            if own > allowed:
+                failures.append(f"{module} cold import took {own:.1f}ms, allowed {allowed:.1f}ms")
+
+    if args.update:
+        with open(BASELINE_PATH, "w") as baseline_file:
+            json.dump(measured, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+
+    for failure in sorted(set(failures)):
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
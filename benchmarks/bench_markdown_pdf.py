@@ -0,0 +1,66 @@
+"""Compare the single-pass markdown compiler with the previous generate_pdf code.
+
+Run from the repository root:
+
+    python benchmarks/bench_markdown_pdf.py [--repeat 5]
+
+Both implementations turn the same synthetic answers into flowables; the time
+to lay out the PDF is not included.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_report import get_styles, build_result_flowables
+from markdown_blocks import parse_markdown
+from legacy_pdf import legacy_result_flowables
+
+# A long answer in the shape the model produces: headings, paragraphs,
+# bullet lists and wide tables, repeated `sections` times
+def synthetic_answer(sections, table_rows=40, bullets=15):
+    parts = []
+    for s in range(sections):
+        parts.append(f"### Section {s}")
+        parts.append("")
+        parts.append(f"This section covers **segment {s}** in detail. " * 6)
+        parts.append("")
+        for b in range(bullets):
+            parts.append(f"- Bullet {b} about customer needs, pricing and channels")
+        parts.append("")
+        parts.append("| Segment | Size | Urgency | Benefit | Example users |")
+        # Unspaced separator - the legacy code does not recognise "| --- |" as a table
+        parts.append("|---|---|---|---|---|")
+        for r in range(table_rows):
+            parts.append(f"| Segment {s}.{r} | {r * 37 % 1000}k | High | Saves time and money | Operators, managers |")
+        parts.append("")
+    return "\n".join(parts)
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    styles = get_styles()
+    print(f"{'answer size':>12} {'legacy':>10} {'parse':>10} {'compile':>10} {'speedup':>8}")
+    for sections in (1, 5, 20, 50):
+        text = synthetic_answer(sections)
+        legacy = best_time(lambda: legacy_result_flowables(text, styles), args.repeat)
+        parse = best_time(lambda: parse_markdown(text), args.repeat)
+        compiled = best_time(lambda: build_result_flowables(text, styles), args.repeat)
+        print(f"{len(text) // 1024:>9} KB {legacy * 1000:>8.1f}ms {parse * 1000:>8.1f}ms "
+              f"{compiled * 1000:>8.1f}ms {legacy / compiled:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
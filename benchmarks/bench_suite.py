@@ -0,0 +1,293 @@
+"""Benchmark prompt parsing, prompt assembly and PDF generation against a baseline.
+
+Run from the repository root:
+
+    python benchmarks/bench_suite.py [--repeat 5] [--only history] [--update]
+
+Cases:
+  parse/<parser>/shipped   each parse_*_prompts function on its prompt file
+  parse/<parser>/x100      the same catalog repeated 100 times
+  history/<idea>/posNN     build_messages for the prompt at position NN (1-30)
+                           with every earlier answer in the history, for a short
+                           idea and for an uploaded paper
+  pdf/30-results/*         generate_pdf on 30 long answers with large tables,
+                           with a cold and a warm fragment cache
+
+Only the analysis and plan prompt files ship with the repository; the other
+parsers run on small synthetic files in their format. Everything runs offline:
+the summaries of older answers are seeded with the extractive stand-in, so no
+request is sent to the API.
+
+Each case is timed over --repeat rounds, taking turns with a fixed calibration
+workload. The baseline in benchmarks/suite_baseline.json stores each case as its
+best ratio to the calibration round timed right before it, so a machine that
+runs faster or slower as a whole (other load, CPU clock) shifts both alike. The
+reported time is that ratio at the calibration speed of the current run, and
+the run fails when it exceeds the baseline by more than --threshold (plus
+--slack-ms). --update rewrites the baseline.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Prompt files are opened relative to the repository root, like in the app
+os.chdir(ROOT)
+
+import context_builder
+from context_builder import build_messages, extractive_summary, format_prompt, _result_key
+from prompt_catalog import (PROMPT_PARSERS, load_mode_catalog, parse_analysis_prompts,
+                            parse_research_prompts, parse_neurips_prompts, parse_iclr_prompts)
+from pdf_report import generate_pdf
+from bench_markdown_pdf import synthetic_answer
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "suite_baseline.json")
+
+# Rounds shorter than this are repeated in a loop, so fast cases are timed reliably.
+# Rounds are also stretched to the slowest function timed alongside
+MIN_ROUND_SECONDS = 0.02
+
+HISTORY_POSITIONS = range(1, 31)
+CATALOG_COPIES = 100
+
+SYNTHETIC_RESEARCH = """# AI Research Paper Prompts
+
+## Problem and Motivation
+
+### Research Question
+- State the problem `<idea>` addresses and why it matters now
+- List the assumptions the work depends on
+
+### Related Work
+- Compare `<idea>` with the closest published approaches
+- Point out what none of them can do
+
+## Method
+
+### Approach
+- Describe the method behind `<idea>` step by step
+- Explain the key design choices
+
+### Evaluation
+- Propose datasets, baselines and metrics for `<idea>`
+- Describe the ablations that would support the claims
+"""
+
+SYNTHETIC_REVIEW = """Review form
+
+1. Briefly summarize the paper and its contributions.
+   Focus on what the paper claims, not on your assessment.
+2. Assess the soundness of the technical claims.
+   Are the claims supported by theory or experiments?
+3. Assess the presentation and clarity.
+4. Assess the significance and originality of the contributions.
+   Is this new, and would others build on it?
+5. List the strengths of the paper.
+6. List the weaknesses of the paper.
+7. List questions for the authors.
+8. Describe the limitations and the potential negative societal impact.
+9. Give an overall score and your confidence.
+"""
+
+# The parsers with the text they are benchmarked on: the shipped prompt file, or a
+# synthetic sample in its format for files that are not part of the repository
+def parser_inputs():
+    inputs = []
+    samples = {
+        parse_research_prompts: SYNTHETIC_RESEARCH,
+        parse_neurips_prompts: SYNTHETIC_REVIEW,
+        parse_iclr_prompts: SYNTHETIC_REVIEW,
+    }
+    for file_name, parser in PROMPT_PARSERS.items():
+        if os.path.exists(file_name):
+            with open(file_name, "r") as prompt_file:
+                inputs.append((parser, "shipped", prompt_file.read()))
+        else:
+            inputs.append((parser, "synthetic", samples[parser]))
+    return inputs
+
+# The catalog repeated `copies` times, with section headings numbered so every
+# copy is parsed as new sections
+def scale_catalog(content, copies, parser):
+    if parser in (parse_neurips_prompts, parse_iclr_prompts):
+        return "\n".join([content] * copies)
+    heading = "### " if parser is parse_analysis_prompts else "## "
+    parts = []
+    for copy_number in range(copies):
+        parts.append("\n".join(
+            f"{line} ({copy_number + 1})" if line.startswith(heading) else line
+            for line in content.split("\n")))
+    return "\n".join(parts)
+
+# Thirty prompts in the order the app shows them (analysis prompts, then plan prompts)
+def history_prompts():
+    prompts = load_mode_catalog("analyze").prompts + load_mode_catalog("plan").prompts
+    return prompts[:max(HISTORY_POSITIONS)]
+
+def history_results(count):
+    return {idx: f"Answer {idx + 1}\n\n" + synthetic_answer(2, table_rows=12, bullets=6) for idx in range(count)}
+
+# Store the extractive stand-in as each result's summary, so build_messages never
+# schedules a summary request
+def seed_summaries(results):
+    with context_builder._summaries_lock:
+        for text in results.values():
+            context_builder._summaries[_result_key(text)] = extractive_summary(text)
+
+def pdf_results(count, nonce=""):
+    return {idx: f"Report answer {idx + 1}{nonce}\n\n" + synthetic_answer(4, table_rows=60, bullets=10)
+            for idx in range(count)}
+
+# Pure-Python work in the same vein as the cases (splitting, stripping, formatting),
+# timed next to each case to calibrate the baseline to the machine's current speed
+CALIBRATION_TEXT = "\n".join(f"- Item {i}: value {i * 7 % 13}  " for i in range(2000))
+
+def calibration_workload():
+    rows = []
+    for line in CALIBRATION_TEXT.split("\n"):
+        label, value = line.strip()[2:].split(":")
+        rows.append(f"{label.lower()}={value.strip()}")
+    return "|".join(sorted(rows))
+
+# Seconds per call of each function in each of `repeat` rounds. The functions take
+# turns round by round, so round N of every function comes from the same stretch of
+# the run. Like timeit, the garbage collector is off while timing, so a collection
+# triggered by earlier cases doesn't land in a round
+def round_times(functions, repeat):
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _round_times(functions, repeat)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+def _round_times(functions, repeat):
+    singles = []
+    for function in functions:
+        function()  # warm up
+        started = time.perf_counter()
+        function()
+        singles.append(time.perf_counter() - started)
+    # Rounds of every function last about as long, so they see the same machine speed
+    round_seconds = max([MIN_ROUND_SECONDS] + singles)
+    loops = [max(1, int(round_seconds / single)) if single > 0 else 1000 for single in singles]
+    rounds = [[] for _ in functions]
+    for _ in range(repeat):
+        for index, function in enumerate(functions):
+            started = time.perf_counter()
+            for _ in range(loops[index]):
+                function()
+            rounds[index].append((time.perf_counter() - started) / loops[index])
+    return rounds
+
+# Best time per call of a case and of the calibration workload, and the best ratio
+# between the case and the calibration round timed right before it
+def measure(function, repeat):
+    calibration_rounds, case_rounds = round_times([calibration_workload, function], repeat)
+    relative = min(case / calibration for calibration, case in zip(calibration_rounds, case_rounds))
+    return min(case_rounds), min(calibration_rounds), relative
+
+def parse_cases():
+    cases = []
+    for parser, source, content in parser_inputs():
+        name = parser.__name__
+        scaled = scale_catalog(content, CATALOG_COPIES, parser)
+        cases.append((f"parse/{name}/{source}", lambda parser=parser, content=content: parser(content)))
+        cases.append((f"parse/{name}/x{CATALOG_COPIES}", lambda parser=parser, scaled=scaled: parser(scaled)))
+    return cases
+
+def history_cases():
+    all_prompts = history_prompts()
+    results = history_results(len(all_prompts))
+    seed_summaries(results)
+    ideas = {
+        "idea": "A marketplace connecting dog owners with vetted local dog walkers",
+        "paper": "Abstract\n\n" + "We study the problem of efficient inference in large models. " * 2500,
+    }
+    cases = []
+    for idea_name, idea in ideas.items():
+        for position in HISTORY_POSITIONS:
+            current_idx = position - 1
+            prompt = all_prompts[current_idx][3]
+            history = {idx: results[idx] for idx in range(current_idx)}
+            cases.append((f"history/{idea_name}/pos{position:02d}",
+                          lambda prompt=prompt, idea=idea, current_idx=current_idx, history=history:
+                          build_messages(format_prompt(prompt, idea), idea, current_idx, all_prompts, history)))
+    return cases
+
+def pdf_cases():
+    all_prompts = history_prompts()
+    warm_results = pdf_results(len(all_prompts))
+    rounds = iter(range(10 ** 9))
+
+    # New answer texts on every call, so nothing comes from the fragment cache
+    def cold():
+        generate_pdf(pdf_results(len(all_prompts), nonce=f" #{next(rounds)}"), all_prompts)
+
+    return [
+        ("pdf/30-results/cold", cold),
+        ("pdf/30-results/warm", lambda: generate_pdf(warm_results, all_prompts)),
+    ]
+
+CASE_GROUPS = {"parse": parse_cases, "history": history_cases, "pdf": pdf_cases}
+
+def load_baseline():
+    try:
+        with open(BASELINE_PATH, "r") as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", choices=sorted(CASE_GROUPS), help="run only these groups of cases")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="allowed slowdown over the baseline as a fraction (default 0.5)")
+    parser.add_argument("--slack-ms", type=float, default=0.05,
+                        help="absolute slack added to the allowed time, for timer noise")
+    parser.add_argument("--update", action="store_true", help="store the measured times as the new baseline")
+    args = parser.parse_args()
+
+    baseline = load_baseline()
+    measured = {}
+    failures = []
+    print(f"{'case':<42} {'time':>11} {'baseline':>11} {'change':>8}")
+    for group in args.only or CASE_GROUPS:
+        for name, function in CASE_GROUPS[group]():
+            elapsed, calibration, relative = measure(function, args.repeat)
+            elapsed_ms, calibration_ms = elapsed * 1000, calibration * 1000
+            measured[name] = {"ms": round(elapsed_ms, 4), "relative": round(relative, 6)}
+            expected_relative = baseline.get(name, {}).get("relative")
+            if expected_relative is None:
+                print(f"{name:<42} {elapsed_ms:>9.3f}ms {'-':>11} {'':>8}")
+                continue
+            # Both times at the speed the calibration workload just ran at
+            expected = expected_relative * calibration_ms
+            calibrated = relative * calibration_ms
+            change = (calibrated - expected) / expected if expected else 0.0
+            print(f"{name:<42} {calibrated:>9.3f}ms {expected:>9.3f}ms {change:>+7.0%}")
+            allowed = expected * (1 + args.threshold) + args.slack_ms
+            if calibrated > allowed and not args.update:
+                failures.append(f"{name} took {calibrated:.3f}ms calibrated, allowed {allowed:.3f}ms")
+
+    if args.update:
+        # Keep the baseline of groups that were not run
+        baseline.update(measured)
+        with open(BASELINE_PATH, "w") as baseline_file:
+            json.dump(dict(sorted(baseline.items())), baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
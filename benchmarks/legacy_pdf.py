@@ -0,0 +1,394 @@
+# Frozen copy of the markdown-to-flowables code generate_pdf used before the
+# single-pass parser in markdown_blocks.py. Kept only as a benchmark baseline.
+from reportlab.platypus import Paragraph, Spacer
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib import colors
+
+def legacy_result_flowables(response_text, styles):
+    content = []
+    
+    # Process and add the response
+    # First, remove any existing HTML tags that might cause problems
+    response_text = response_text.replace("<para>", "").replace("</para>", "")
+    response_text = response_text.replace("<b>", "").replace("</b>", "")
+    response_text = response_text.replace("<br>", "\n").replace("<br/>", "\n")
+    
+    # Now apply our own formatting
+    # Replace markdown elements with reportlab styling
+    response_text = response_text.replace("###", "")
+    response_text = response_text.replace("##", "")
+    
+    # Special handling for markdown tables
+    if "|" in response_text:
+        # This is a markdown table - we need special handling
+        try:
+            # First, treat the table separately from rest of text
+            sections = []
+            current_section = ""
+            in_table = False
+            
+            lines = response_text.split("\n")
+            i = 0
+            while i < len(lines):
+                line = lines[i].strip()
+                
+                # Check if this line could be the start of a table
+                if "|" in line:
+                    # Look ahead to see if next line contains table header separator
+                    is_table_start = False
+                    for j in range(i+1, min(i+3, len(lines))):
+                        next_line = lines[j].strip()
+                        # Check for various Markdown table header separator formats
+                        if ("|" in next_line and 
+                            ("-|-" in next_line or 
+                             "---|" in next_line or 
+                             "|---" in next_line or
+                             ":--" in next_line or
+                             "--:" in next_line)):
+                            is_table_start = True
+                            break
+                    
+                    if is_table_start:
+                        # End previous text section
+                        if current_section:
+                            sections.append(("text", current_section))
+                            current_section = ""
+                        
+                        # Start collecting table content
+                        in_table = True
+                        table_content = line + "\n"
+                        i += 1
+                        continue
+                
+                # Process based on whether we're in a table or not
+                if in_table:
+                    if "|" in line:
+                        # Still part of the table
+                        table_content += line + "\n"
+                    else:
+                        # Empty line might still be part of table formatting
+                        if not line.strip():
+                            i += 1
+                            # Check if next line has pipes (still table)
+                            if i < len(lines) and "|" in lines[i]:
+                                table_content += "\n" + lines[i] + "\n"
+                                continue
+                        
+                        # End of table reached
+                        sections.append(("table", table_content))
+                        in_table = False
+                        current_section = line + "\n" if line else ""
+                else:
+                    # Regular text
+                    current_section += line + "\n"
+                
+                i += 1
+            
+            # Add the last section
+            if in_table:
+                sections.append(("table", table_content))
+            elif current_section:
+                sections.append(("text", current_section))
+            
+            # Process each section
+            for section_type, section_content in sections:
+                if section_type == "text":
+                    # Process regular text with improved formatting for bullet points
+                    lines = section_content.split("\n")
+                    processed_paras = []
+                    current_para = []
+                    in_bullet_list = False
+                    
+                    for line in lines:
+                        line_stripped = line.strip()
+                        
+                        # Check if line is empty - potential paragraph break
+                        if not line_stripped:
+                            # End current paragraph if we have content
+                            if current_para:
+                                processed_paras.append("\n".join(current_para))
+                                current_para = []
+                                in_bullet_list = False
+                            continue
+                        
+                        # Check for bullet points
+                        if line_stripped.startswith("- ") or line_stripped.startswith("* "):
+                            # If we're starting a new bullet list, end previous paragraph
+                            if not in_bullet_list and current_para:
+                                processed_paras.append("\n".join(current_para))
+                                current_para = []
+                            
+                            # Format bullet point
+                            if line_stripped.startswith("- "):
+                                bullet_text = "• " + line_stripped[2:]
+                            else:  # starts with *
+                                bullet_text = "• " + line_stripped[2:]
+                            
+                            # Add bullet point
+                            current_para.append(bullet_text)
+                            in_bullet_list = True
+                        else:
+                            # Regular text line
+                            # If we were in a bullet list, end it
+                            if in_bullet_list:
+                                processed_paras.append("\n".join(current_para))
+                                current_para = []
+                                in_bullet_list = False
+                            
+                            # Add regular text line
+                            current_para.append(line_stripped)
+                    
+                    # Add final paragraph if any
+                    if current_para:
+                        processed_paras.append("\n".join(current_para))
+                    
+                    # Create paragraphs with proper styling
+                    for paragraph in processed_paras:
+                        if not paragraph.strip():
+                            continue
+                            
+                        try:
+                            # Check if this is a bullet list
+                            if "•" in paragraph:
+                                # Special style for bullet points with extra spacing
+                                bullet_style = ParagraphStyle(
+                                    "BulletStyle", 
+                                    parent=styles["CustomNormal"],
+                                    leftIndent=10,
+                                    leading=14  # Line spacing for bullets
+                                )
+                                content.append(Paragraph(paragraph, bullet_style))
+                            else:
+                                # Regular paragraph
+                                content.append(Paragraph(paragraph, styles["CustomNormal"]))
+                            
+                            # Add space between paragraphs
+                            content.append(Spacer(1, 8))
+                        except Exception as e:
+                            print(f"Error adding paragraph: {str(e)}")
+                            content.append(Paragraph("Error formatting content", styles["CustomNormal"]))
+                
+                elif section_type == "table":
+                    # Import only Table and TableStyle, don't reimport colors
+                    from reportlab.platypus import Table, TableStyle
+                    
+                    # Clean and preprocess the markdown table text
+                    table_text = section_content.strip()
+                    
+                    # Clean up common markdown table formatting issues
+                    # 1. Fix situations where content is split across lines improperly
+                    lines = table_text.split('\n')
+                    cleaned_lines = []
+                    current_line = ""
+                    
+                    for line in lines:
+                        stripped = line.strip()
+                        if not stripped:
+                            continue
+                            
+                        # If line has pipes and doesn't look like a header separator
+                        if "|" in stripped:
+                            # If it's a header separator line, add it as is
+                            if any(sep in stripped for sep in ["---", ":-:", "-|-", ":--", "--:"]):
+                                # Add previous constructed line if any
+                                if current_line:
+                                    cleaned_lines.append(current_line)
+                                    current_line = ""
+                                # Add separator line
+                                cleaned_lines.append(stripped)
+                            # Otherwise it's a content line
+                            else:
+                                # Check if it's a complete row with balanced pipes
+                                if stripped.startswith("|") and stripped.endswith("|"):
+                                    # Complete line with matching first and last pipes
+                                    if current_line:
+                                        cleaned_lines.append(current_line)
+                                        current_line = ""
+                                    cleaned_lines.append(stripped)
+                                else:
+                                    # Incomplete line or line continuation - append to current line
+                                    if not current_line:
+                                        current_line = stripped
+                                    else:
+                                        current_line += " " + stripped
+                    
+                    # Add any remaining line
+                    if current_line:
+                        cleaned_lines.append(current_line)
+                    
+                    # Ensure proper table structure with pipes at start/end
+                    for i in range(len(cleaned_lines)):
+                        line = cleaned_lines[i]
+                        # Add missing pipes at beginning/end if needed
+                        if not line.startswith("|"):
+                            cleaned_lines[i] = "|" + line
+                        if not line.endswith("|"):
+                            cleaned_lines[i] = cleaned_lines[i] + "|"
+                                            
+                    # Now extract the actual table data
+                    data_rows = []
+                    header_row = None
+                    
+                    for i, line in enumerate(cleaned_lines):
+                        # Skip empty lines
+                        if not line.strip():
+                            continue
+                            
+                        # Skip separator rows (the ones with ---)
+                        if any(sep in line for sep in ["---", ":-:", "-|-", ":--", "--:"]):
+                            continue
+                            
+                        # Process table row - split by pipes and clean
+                        cells = [cell.strip() for cell in line.split("|")]
+                        # Remove empty cells from start/end (which come from the outer pipes)
+                        cells = [cell for cell in cells if cell != ""]
+                        
+                        if cells:
+                            if header_row is None:
+                                header_row = cells
+                            else:
+                                data_rows.append(cells)
+                    
+                    # Create table data with header and rows
+                    if header_row and len(header_row) > 0:
+                        # Create table data by combining header and data rows
+                        table_data = [header_row]
+                        if data_rows:
+                            table_data.extend(data_rows)
+                        
+                        # Create the table
+                        try:
+                            # Make sure all rows have the same number of columns
+                            max_cols = max(len(row) for row in table_data)
+                            for row in table_data:
+                                while len(row) < max_cols:
+                                    row.append("")
+                            
+                            # Calculate column widths based on content
+                            col_widths = [None] * max_cols
+                            
+                            # Get available width (letter page width minus margins)
+                            available_width = 500  # Approximate available width in points
+                            
+                            # Create and style the table with adjusted width
+                            table = Table(table_data, colWidths=col_widths, repeatRows=1)
+                            table.setStyle(TableStyle([
+                                ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+                                ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+                                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+                                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                                ('FONTSIZE', (0, 0), (-1, -1), 8),  # Smaller font for tables
+                                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+                                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+                                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                                ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+                                ('LEFTPADDING', (0, 0), (-1, -1), 2),  # Reduce cell padding
+                                ('RIGHTPADDING', (0, 0), (-1, -1), 2),  # Reduce cell padding
+                                ('TOPPADDING', (0, 0), (-1, -1), 3),    # Reduce cell padding
+                                ('BOTTOMPADDING', (0, 0), (-1, -1), 3), # Reduce cell padding
+                                ('WORDWRAP', (0, 0), (-1, -1), True),   # Enable word wrapping
+                            ]))
+                            
+                            # Add to content
+                            content.append(table)
+                            content.append(Spacer(1, 12))
+                        except Exception as e:
+                            print(f"Error creating table: {str(e)}")
+                            # Fallback to plain text version
+                            content.append(Paragraph("Table formatting error. Displaying as text:", styles["CustomNormal"]))
+                            for row in table_data:
+                                content.append(Paragraph(" | ".join(row), styles["CustomNormal"]))
+                    else:
+                        # Fallback if no proper table structure found
+                        content.append(Paragraph("Table could not be properly formatted:", styles["CustomNormal"]))
+                        for line in cleaned_lines:
+                            if line.strip() and not ("---" in line and "|" in line):
+                                content.append(Paragraph(line, styles["CustomNormal"]))
+                    
+                    content.append(Spacer(1, 12))
+        
+        except Exception as e:
+            print(f"Error processing table: {str(e)}")
+            # Fallback: just replace pipes and treat as plain text
+            response_text = response_text.replace("|", " | ")
+            content.append(Paragraph(response_text, styles["CustomNormal"]))
+    
+    else:
+        # No tables, process as regular text
+        # Handle bullet points and paragraphs properly
+        lines = response_text.split("\n")
+        processed_paras = []
+        current_para = []
+        in_bullet_list = False
+        
+        for line in lines:
+            line_stripped = line.strip()
+            
+            # Check if line is empty - potential paragraph break
+            if not line_stripped:
+                # End current paragraph if we have content
+                if current_para:
+                    processed_paras.append("\n".join(current_para))
+                    current_para = []
+                    in_bullet_list = False
+                continue
+            
+            # Check for bullet points
+            if line_stripped.startswith("- ") or line_stripped.startswith("* "):
+                # If we're starting a new bullet list, end previous paragraph
+                if not in_bullet_list and current_para:
+                    processed_paras.append("\n".join(current_para))
+                    current_para = []
+                
+                # Format bullet point
+                if line_stripped.startswith("- "):
+                    bullet_text = "• " + line_stripped[2:]
+                else:  # starts with *
+                    bullet_text = "• " + line_stripped[2:]
+                
+                # Add bullet point
+                current_para.append(bullet_text)
+                in_bullet_list = True
+            else:
+                # Regular text line
+                # If we were in a bullet list, end it
+                if in_bullet_list:
+                    processed_paras.append("\n".join(current_para))
+                    current_para = []
+                    in_bullet_list = False
+                
+                # Add regular text line
+                current_para.append(line_stripped)
+        
+        # Add final paragraph if any
+        if current_para:
+            processed_paras.append("\n".join(current_para))
+        
+        # Create paragraphs with proper styling
+        for paragraph in processed_paras:
+            if not paragraph.strip():
+                continue
+                
+            try:
+                # Check if this is a bullet list
+                if "•" in paragraph:
+                    # Special style for bullet points with extra spacing
+                    bullet_style = ParagraphStyle(
+                        "BulletStyle", 
+                        parent=styles["CustomNormal"],
+                        leftIndent=10,
+                        leading=14  # Line spacing for bullets
+                    )
+                    content.append(Paragraph(paragraph, bullet_style))
+                else:
+                    # Regular paragraph
+                    content.append(Paragraph(paragraph, styles["CustomNormal"]))
+                
+                # Add space between paragraphs
+                content.append(Spacer(1, 8))
+            except Exception as e:
+                print(f"Error adding paragraph: {str(e)}")
+                # Fallback: add as plain text without any formatting
+                content.append(Paragraph("Error formatting content", styles["CustomNormal"]))
+    return content
@@ -0,0 +1,223 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from openai_client import get_client
+from response_cache import lookup_response, store_response
+from rate_limiter import call_with_retries, request_tokens
+
+# System prompt sent at the start of every conversation
+SYSTEM_PROMPT = """You are a startup analysis expert. Provide detailed, data-driven responses. Build upon previous analyses in your responses.
+
+Format your output using Markdown:
+1. Use tables to organize information when presenting comparative data, metrics, or segments
+2. IMPORTANT: When formatting tables:
+   - Ensure each row has the same number of cells/columns (always match the header)
+   - Do not use bullet points inside table cells (use simple text instead)
+   - Keep table cell content concise (use short phrases or single words when possible)
+   - Use clear column headers in the first row
+   - Each row must be on a single line (no line breaks inside a row)
+   - Format tables properly with header separator rows using this exact format: | --- | --- | --- |
+   - Make sure columns are properly aligned with | at beginning and end of each row
+   - For wide tables with many columns, consider breaking into multiple smaller tables
+   - Use proper markdown table syntax with pipes and dashes
+   - Keep table width to max 5-6 columns for readability
+3. Use bullet points for lists and key points (outside of tables)
+   - Place an empty line before and after bullet point lists
+   - Start each bullet with a single hyphen (-)
+4. Use headers (### or ####) to organize sections
+5. Clearly label all sections and tables"""
+
+# Approximate token budget for the whole request (system, history and current prompt)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "12000"))
+
+# Number of most recent results sent verbatim; older ones are sent as summaries
+CONTEXT_RECENT_RESULTS = int(os.environ.get("CONTEXT_RECENT_RESULTS", "2"))
+
+# Model and length used for the compact summaries of older results
+SUMMARY_MODEL = os.environ.get("CONTEXT_SUMMARY_MODEL", "gpt-4o-mini")
+SUMMARY_MAX_TOKENS = int(os.environ.get("CONTEXT_SUMMARY_MAX_TOKENS", "300"))
+
+# Ideas longer than this (an uploaded paper) are sent once as a document message
+# instead of being substituted into every prompt
+DOCUMENT_MIN_TOKENS = int(os.environ.get("DOCUMENT_MIN_TOKENS", "2000"))
+
+# Documents longer than this are analyzed chunk by chunk and the answers merged
+DOCUMENT_MAX_TOKENS = int(os.environ.get("DOCUMENT_MAX_TOKENS", "60000"))
+DOCUMENT_CHUNK_TOKENS = int(os.environ.get("DOCUMENT_CHUNK_TOKENS", "20000"))
+
+# Stands in for <idea> in prompts when the idea is sent as a document
+DOCUMENT_REFERENCE = "the document provided above"
+
+# Number of summaries kept in memory
+SUMMARY_CACHE_SIZE = 2048
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the following startup analysis in at most 150 words. "
+    "Keep the key conclusions, chosen segments, numbers and names; drop formatting and tables."
+)
+
+# Summaries shared by all sessions, keyed by a hash of the full result text
+_summaries = OrderedDict()
+_pending = set()
+_summaries_lock = threading.Lock()
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="context-summary")
+
+# Rough token count - about four characters per token for English text
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+# True when the idea is long enough to be sent once as a document
+def is_document(idea):
+    return estimate_tokens(idea) > DOCUMENT_MIN_TOKENS
+
+# Substitute the idea into a prompt - or a reference to it when it is sent as a document
+def format_prompt(prompt, idea):
+    return prompt.replace('<idea>', DOCUMENT_REFERENCE if is_document(idea) else idea)
+
+# Split a document into chunks of about chunk_tokens, at paragraph boundaries where possible
+def split_document(text, chunk_tokens=None):
+    if chunk_tokens is None:
+        chunk_tokens = DOCUMENT_CHUNK_TOKENS
+    max_chars = max(chunk_tokens, 1) * 4
+    chunks = []
+    current = []
+    length = 0
+    for paragraph in text.split("\n\n"):
+        # A single paragraph longer than a chunk is cut into pieces
+        pieces = [paragraph[start:start + max_chars] for start in range(0, len(paragraph), max_chars)] or [""]
+        for piece in pieces:
+            if current and length + len(piece) > max_chars:
+                chunks.append("\n\n".join(current))
+                current = []
+                length = 0
+            current.append(piece)
+            length += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def _result_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+# Cheap stand-in used until the real summary is ready: headings and the first
+# line of each paragraph, cut to the summary length
+def extractive_summary(text, max_tokens=SUMMARY_MAX_TOKENS):
+    max_chars = max_tokens * 4
+    picked = []
+    length = 0
+    start_of_block = True
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            start_of_block = True
+            continue
+        if stripped.startswith("|"):
+            continue
+        if stripped.startswith("#") or start_of_block:
+            picked.append(stripped.lstrip("#").strip())
+            length += len(picked[-1]) + 1
+            if length >= max_chars:
+                break
+        start_of_block = False
+    return "\n".join(picked)[:max_chars]
+
+def _summarize(key, text):
+    try:
+        client = get_client()
+        if client is None:
+            return
+        messages = [
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": text},
+        ]
+        # Summaries go through the response cache too, so a restarted process
+        # rebuilds the exact same context (and hits the cache for later prompts)
+        cache_key, summary = lookup_response(SUMMARY_MODEL, messages, 0, SUMMARY_MAX_TOKENS)
+        if summary is None:
+            response = call_with_retries(lambda: client.chat.completions.create(
+                model=SUMMARY_MODEL,
+                messages=messages,
+                temperature=0,
+                max_tokens=SUMMARY_MAX_TOKENS,
+            ), request_tokens(messages, SUMMARY_MAX_TOKENS))
+            summary = response.choices[0].message.content or ""
+            if summary.strip():
+                store_response(cache_key, summary)
+        if summary.strip():
+            with _summaries_lock:
+                _summaries[key] = summary.strip()
+                while len(_summaries) > SUMMARY_CACHE_SIZE:
+                    _summaries.popitem(last=False)
+    except Exception as e:
+        print(f"Summary generation failed: {str(e)}")
+    finally:
+        with _summaries_lock:
+            _pending.discard(key)
+
+# Start summarizing a finished result in the background (once per distinct result)
+def schedule_summary(text):
+    # Imported here - generation imports this module
+    from generation import is_error_result
+    if is_error_result(text):
+        return
+    key = _result_key(text)
+    with _summaries_lock:
+        if key in _summaries or key in _pending:
+            return
+        _pending.add(key)
+    _summary_executor.submit(_summarize, key, text)
+
+# Return the cached summary of a result, or an extractive one while it is being generated
+def get_summary(text):
+    key = _result_key(text)
+    with _summaries_lock:
+        summary = _summaries.get(key)
+        if summary is not None:
+            _summaries.move_to_end(key)
+            return summary
+    schedule_summary(text)
+    return extractive_summary(text)
+
+# Build the chat messages for the prompt at current_idx.
+# A long idea (or `document`, when given) is sent once, right after the system prompt,
+# and is not counted against the token budget.
+# The newest CONTEXT_RECENT_RESULTS results are sent verbatim, older ones as summaries,
+# and the oldest history is dropped once the token budget is used up.
+def build_messages(formatted_prompt, idea, current_idx, all_prompts, results, token_budget=None, document=None):
+    if token_budget is None:
+        token_budget = CONTEXT_TOKEN_BUDGET
+    if document is None and is_document(idea):
+        document = f"Document:\n\n{idea}"
+    shared = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if document is not None:
+        shared.append({"role": "user", "content": document})
+
+    current_message = {"role": "user", "content": f"Based on all previous analyses, please provide the next analysis: {formatted_prompt}"}
+    remaining = token_budget - estimate_tokens(SYSTEM_PROMPT) - estimate_tokens(current_message["content"])
+
+    # Walk the history newest first so the budget goes to the most relevant results
+    history = []
+    verbatim_left = CONTEXT_RECENT_RESULTS
+    for i in range(current_idx - 1, -1, -1):
+        if i not in results:
+            continue
+        section_name, num, title, prev_prompt = all_prompts[i]
+        request = {"role": "user", "content": f"Previous analysis request {i+1}: {format_prompt(prev_prompt, idea)}"}
+        cost = estimate_tokens(request["content"])
+
+        result = {"role": "assistant", "content": f"Previous analysis result {i+1}: {results[i]}"}
+        if verbatim_left <= 0 or cost + estimate_tokens(result["content"]) > remaining:
+            result = {"role": "assistant", "content": f"Summary of previous analysis result {i+1}: {get_summary(results[i])}"}
+        verbatim_left -= 1
+        cost += estimate_tokens(result["content"])
+
+        if cost > remaining:
+            break
+        remaining -= cost
+        history.append(result)
+        history.append(request)
+
+    history.reverse()
+    return shared + history + [current_message]
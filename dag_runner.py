@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from generation import generate_response, is_error_result, error_result
+from context_builder import schedule_summary, CONTEXT_RECENT_RESULTS
+
+# Maximum number of prompts generated at the same time by "Run all"
+RUN_ALL_PARALLELISM = int(os.environ.get("RUN_ALL_PARALLELISM", "4"))
+
+# Generate one prompt with only its dependencies' results as history.
+# `partial` is the text of an earlier incomplete answer to continue.
+def _generate(idx, all_prompts, dependencies, idea, results, mode=None, partial=None):
+    _, _, _, prompt = all_prompts[idx]
+    dependency_results = {dep: results[dep] for dep in dependencies[idx]}
+    return generate_response(prompt, idea, idx, all_prompts, dependency_results, partial=partial, mode=mode)
+
+# Prompts whose answers a later prompt's history sends as a summary: build_messages
+# keeps only the newest CONTEXT_RECENT_RESULTS earlier results verbatim, and a prompt
+# run here only sees its own dependencies. Answers summarized for other reasons (the
+# token budget) are summarized on demand.
+def _summarized_prompts(dependencies):
+    summarized = set()
+    for idx, deps in enumerate(dependencies):
+        earlier = sorted((dep for dep in deps if dep < idx), reverse=True)
+        summarized.update(earlier[CONTEXT_RECENT_RESULTS:])
+    return summarized
+
+# Generate every prompt that has no result yet, running prompts whose dependencies
+# are finished concurrently (at most max_parallel at once).
+# Results are written into `results` from the calling thread; on_result(idx, result)
+# is called after each one. Prompts whose dependencies failed are left out.
+# `partials` maps prompts without a result to the text of an incomplete answer,
+# which is continued instead of generated again.
+def run_all(all_prompts, dependencies, idea, results, max_parallel=None, on_result=None, should_stop=None,
+            mode=None, partials=None):
+    if max_parallel is None:
+        max_parallel = RUN_ALL_PARALLELISM
+    max_parallel = max(max_parallel, 1)
+
+    pending = [idx for idx in range(len(all_prompts)) if idx not in results]
+    running = {}
+    summarized = _summarized_prompts(dependencies)
+
+    with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="run-all") as executor:
+        while pending or running:
+            if should_stop is None or not should_stop():
+                for idx in list(pending):
+                    if len(running) >= max_parallel:
+                        break
+                    deps = dependencies[idx]
+                    if not all(dep in results for dep in deps):
+                        continue
+                    pending.remove(idx)
+                    if any(is_error_result(results[dep]) for dep in deps):
+                        # A dependency failed - this prompt cannot run
+                        continue
+                    future = executor.submit(_generate, idx, all_prompts, dependencies, idea, dict(results), mode,
+                                             (partials or {}).get(idx))
+                    running[future] = idx
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = error_result(f"Error generating response: {str(e)}")
+                results[idx] = result
+                if idx in summarized:
+                    schedule_summary(result)
+                if on_result is not None:
+                    on_result(idx, result)
+
+    return results
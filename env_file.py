@@ -0,0 +1,7 @@
+from dotenv import load_dotenv
+
+# Settings come from environment variables and from the .env file. Most modules read
+# theirs at import time, so the entry points import this module before any other of
+# ours: the file is loaded once per process, and variables already set in the
+# environment take precedence over it.
+load_dotenv()
@@ -0,0 +1,337 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from openai_client import MODEL, get_api_key, get_client
+from context_builder import (SYSTEM_PROMPT, DOCUMENT_MAX_TOKENS, build_messages, estimate_tokens,
+                             format_prompt, is_document, split_document)
+from response_cache import lookup_response, store_response
+from async_engine import get_engine
+from rate_limiter import call_with_retries, request_tokens
+import metrics
+
+# Sampling settings for every generation (also part of the response cache key)
+TEMPERATURE = 0.7
+MAX_TOKENS = 2000
+
+# Chunks of an over-long document analyzed at the same time
+MAP_REDUCE_PARALLELISM = int(os.environ.get("MAP_REDUCE_PARALLELISM", "4"))
+
+# Streamed text is pushed to the UI at most this often, or sooner once this many characters arrived
+STREAM_FLUSH_INTERVAL = float(os.environ.get("STREAM_FLUSH_INTERVAL_MS", "75")) / 1000
+STREAM_FLUSH_CHARS = int(os.environ.get("STREAM_FLUSH_CHARS", "4096"))
+
+# Times a broken stream is resumed from the text received so far
+STREAM_RESUME_ATTEMPTS = int(os.environ.get("STREAM_RESUME_ATTEMPTS", "2"))
+
+# Sent after the partial text to continue a cut-off answer
+CONTINUE_PROMPT = ("Your previous answer was cut off. Continue it exactly where it stopped, "
+                   "without repeating anything and without any introduction.")
+
+# Appended to an answer that stopped early and could not be resumed
+INCOMPLETE_MARKER = "\n\n*[Answer incomplete - the connection was lost. Use Retry to finish it.]*"
+
+# Appended to the message stored instead of an answer when generation failed. Failures
+# are told apart by this marker, not by their wording: an answer may start with "Error".
+ERROR_MARKER = "\n\n*[No answer - generation failed. Use Retry to try again.]*"
+
+# How often a waiting consumer checks should_stop while no delta arrives
+STREAM_POLL_SECONDS = 0.5
+
+# Error message to display if there's no API key
+API_KEY_ERROR_MSG = """
+    Error: No valid OpenAI API key found. Please:
+    
+    1. Get a valid API key from https://platform.openai.com/api-keys
+    2. Add it to your .env file as OPENAI_API_KEY=your_key
+    3. Restart the app
+    """
+
+INSUFFICIENT_QUOTA_MSG = """
+            Error: Your OpenAI account has insufficient quota or credits.
+            
+            Please visit https://platform.openai.com/account/billing to add credits to your account.
+            Once you've added credits, restart the app to continue.
+            """
+
+# Assembles a streamed answer in linear time and coalesces display updates.
+# <br> tags are replaced with spaces chunk by chunk; a tag split across chunks
+# is held back until its next chunk arrives, so the result matches replacing
+# them in the whole text.
+class StreamBuffer:
+    BR_TAG = "<br>"
+
+    def __init__(self, on_update=None, flush_interval=None, flush_chars=None):
+        self.on_update = on_update
+        self.flush_interval = STREAM_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.flush_chars = STREAM_FLUSH_CHARS if flush_chars is None else flush_chars
+        self._raw = []
+        self._pending = []
+        self._display = ""
+        self._tail = ""
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def append(self, content):
+        self._raw.append(content)
+        text = self._tail + content
+        # Hold back a trailing "<", "<b" or "<br" that may complete in the next chunk
+        keep = 0
+        for size in range(min(len(self.BR_TAG) - 1, len(text)), 0, -1):
+            if self.BR_TAG.startswith(text[-size:]):
+                keep = size
+                break
+        self._tail = text[len(text) - keep:] if keep else ""
+        self._pending.append(text[:len(text) - keep].replace(self.BR_TAG, " "))
+
+        self._unflushed += len(content)
+        if self.on_update is not None:
+            now = time.monotonic()
+            if self._unflushed >= self.flush_chars or now - self._last_flush >= self.flush_interval:
+                self.flush(now)
+
+    # Push the text so far to on_update
+    def flush(self, now=None):
+        if self.on_update is None or not self._unflushed:
+            return
+        self.on_update(self.display_text())
+        self._unflushed = 0
+        self._last_flush = time.monotonic() if now is None else now
+
+    # Text for display, with <br> tags replaced
+    def display_text(self):
+        if self._pending:
+            self._display += "".join(self._pending)
+            self._pending = []
+        return self._display + self._tail
+
+    # The answer exactly as received
+    def text(self):
+        return "".join(self._raw)
+
+# Answer a prompt from one chunk of a document (the map step, not streamed)
+def _map_chunk(client, formatted_prompt, chunk, part, parts):
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Document, part {part} of {parts}:\n\n{chunk}"},
+        {"role": "user", "content": f"Using only this part of the document, please provide the following analysis: {formatted_prompt}"},
+    ]
+    cache_key, cached_response = lookup_response(MODEL, messages, TEMPERATURE, MAX_TOKENS)
+    if cached_response is not None:
+        return cached_response
+    response = call_with_retries(lambda: client.chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS,
+        timeout=600
+    ), request_tokens(messages, MAX_TOKENS))
+    answer = response.choices[0].message.content or ""
+    if answer:
+        store_response(cache_key, answer)
+    return answer
+
+# Analyze each chunk of an over-long document concurrently and return the partial
+# answers as one document message for the reduce step
+def map_document(client, formatted_prompt, document):
+    chunks = split_document(document)
+    print(f"Document too long for one request - analyzing {len(chunks)} parts")
+    with ThreadPoolExecutor(max_workers=max(MAP_REDUCE_PARALLELISM, 1), thread_name_prefix="map-reduce") as executor:
+        answers = list(executor.map(
+            lambda numbered: _map_chunk(client, formatted_prompt, numbered[1], numbered[0] + 1, len(chunks)),
+            enumerate(chunks)))
+    parts = [f"Analysis of document part {part} of {len(chunks)}:\n\n{answer}"
+             for part, answer in enumerate(answers, start=1)]
+    return "The document was too long to send at once. These are analyses of each of its parts:\n\n" + "\n\n".join(parts)
+
+# Raised when a stream breaks after the API accepted the request
+class StreamInterrupted(Exception):
+    pass
+
+# The request that continues an answer cut off after `received`, asking only for the rest
+def continuation_request(messages, received):
+    if not received:
+        return messages, MAX_TOKENS
+    messages = messages + [
+        {"role": "assistant", "content": received},
+        {"role": "user", "content": CONTINUE_PROMPT},
+    ]
+    return messages, max(MAX_TOKENS - estimate_tokens(received), 1)
+
+# Stream one request (or the continuation of `received`) into buffer.
+# Returns True when should_stop() ended it early. `timing` collects the first delta
+# time for the metrics; `labels` are the metric labels.
+def _stream_into(buffer, messages, received, should_stop, timing, labels):
+    request_messages, max_tokens = continuation_request(messages, received)
+    metrics.generation_input_tokens.inc(
+        sum(estimate_tokens(message["content"]) for message in request_messages), **labels)
+    # The stream runs on the shared event loop; its deltas arrive through a queue
+    stream = get_engine().start_stream(
+        model=MODEL,
+        messages=request_messages,
+        temperature=TEMPERATURE,
+        max_tokens=max_tokens,
+        timeout=600  # Set 10-minute timeout for API call
+    )
+    try:
+        while True:
+            if should_stop is not None and should_stop():
+                stream.cancel()
+                return True
+            try:
+                delta = stream.next_delta(timeout=STREAM_POLL_SECONDS)
+            except StopIteration:
+                return False
+            except Exception as e:
+                if stream.opened.is_set():
+                    raise StreamInterrupted() from e
+                raise
+            if delta:
+                if "first_delta" not in timing:
+                    # Measured from sending the attempt that succeeded: connection setup, upload and
+                    # server queueing count, limiter and backoff waits (recorded separately) do not
+                    timing["first_delta"] = time.monotonic()
+                    metrics.generation_ttft_seconds.observe(timing["first_delta"] - stream.sent_at, **labels)
+                # Buffer the chunk - the display is refreshed every STREAM_FLUSH_INTERVAL
+                buffer.append(delta)
+    finally:
+        metrics.generation_wait_seconds.observe(stream.wait_seconds, **labels)
+
+# Generate the response for the prompt at current_idx with streaming.
+# on_update(text) is called with the response so far after each streamed chunk;
+# should_stop() is polled between chunks to abandon the stream early.
+# A long idea (an uploaded paper) is sent once per request rather than substituted
+# into every prompt; one over the context limit is analyzed in parts and merged.
+# A stream that breaks is resumed from the text received so far; if that fails too,
+# the partial answer is returned with INCOMPLETE_MARKER, and passing it back as
+# `partial` continues it later.
+# `mode` only labels the metrics. Does not depend on Streamlit, so it can run on worker threads.
+def generate_response(prompt, idea, current_idx, all_prompts, results, on_update=None, should_stop=None,
+                      partial=None, mode=None):
+    started = time.monotonic()
+    labels = {"mode": mode or "", "prompt": current_idx + 1}
+    api_key = get_api_key()
+    
+    # Format the prompt first
+    formatted_prompt = format_prompt(prompt, idea)
+    
+    # Check if we have a valid API key
+    if not api_key:
+        print("DEBUG: No valid API key available")
+        metrics.record_error("generation", "MissingApiKey", mode)
+        return error_result(API_KEY_ERROR_MSG)
+    
+    try:
+        # Shared synchronous client, used for the (non-streamed) map step
+        direct_client = get_client()
+        
+        # Map-reduce for documents too long for one request: the parts are analyzed
+        # first and the streamed answer merges them
+        document = None
+        if is_document(idea) and estimate_tokens(idea) > DOCUMENT_MAX_TOKENS:
+            if on_update is not None:
+                on_update("Analyzing the document in parts...")
+            document = map_document(direct_client, formatted_prompt, idea)
+            formatted_prompt = f"Merge the analyses of the document parts into one complete answer to: {formatted_prompt}"
+        
+        # Build message history - recent results verbatim, older ones as cached
+        # summaries, kept within the context token budget
+        assembly_started = time.monotonic()
+        messages = build_messages(formatted_prompt, idea, current_idx, all_prompts, results, document=document)
+        metrics.prompt_assembly_seconds.observe(time.monotonic() - assembly_started, **labels)
+        
+        # Replay a stored answer for an identical request without calling the API
+        cache_key, cached_response = lookup_response(MODEL, messages, TEMPERATURE, MAX_TOKENS)
+        if cached_response is not None:
+            print(f"Response cache hit for prompt {current_idx + 1}")
+            if on_update is not None:
+                on_update(cached_response.replace("<br>", " "))
+            metrics.generations_total.inc(outcome="cached", **labels)
+            return cached_response
+        
+        print(f"Making streaming API call with key: {api_key[:4]}...{api_key[-4:]}")
+        
+        buffer = StreamBuffer(on_update)
+        if partial:
+            # Continue an answer that stopped early instead of paying for it again
+            buffer.append(partial)
+        stopped = False
+        complete = False
+        resumes = 0
+        timing = {}
+        while True:
+            received = buffer.text()
+            try:
+                stopped = _stream_into(buffer, messages, received, should_stop, timing, labels)
+                complete = not stopped
+                break
+            except StreamInterrupted as e:
+                print(f"Streaming error: {str(e.__cause__)}")
+                metrics.record_error("generation", e.__cause__, mode)
+                if not buffer.text():
+                    metrics.generations_total.inc(outcome="error", **labels)
+                    return error_result("Error during streaming. Please try again.")
+                if resumes >= STREAM_RESUME_ATTEMPTS:
+                    break
+            except Exception as e:
+                if not received:
+                    # The request itself was refused - reported like any other API error
+                    raise
+                print(f"Could not resume the answer: {str(e)}")
+                metrics.record_error("generation", e, mode)
+                break
+            resumes += 1
+            print(f"Resuming answer after {len(buffer.text())} characters (attempt {resumes})")
+        
+        # Show whatever arrived since the last refresh
+        buffer.flush()
+        full_response = buffer.text()
+        if complete and full_response:
+            # Only complete answers are worth replaying
+            store_response(cache_key, full_response)
+        elif not stopped:
+            # Keep what arrived - Retry continues the answer from here
+            full_response += INCOMPLETE_MARKER
+            if on_update is not None:
+                on_update(full_response.replace("<br>", " "))
+        
+        finished = time.monotonic()
+        output_tokens = estimate_tokens(buffer.text()[len(partial or ""):])
+        metrics.generation_output_tokens.inc(output_tokens, **labels)
+        metrics.generation_seconds.observe(finished - started, **labels)
+        if "first_delta" in timing and finished > timing["first_delta"]:
+            metrics.generation_tokens_per_second.observe(output_tokens / (finished - timing["first_delta"]), **labels)
+        outcome = "complete" if complete else "stopped" if stopped else "incomplete"
+        metrics.generations_total.inc(outcome=outcome, **labels)
+        return full_response
+    except Exception as e:
+        error_str = str(e)
+        print(f"DEBUG: API error: {error_str}")
+        metrics.record_error("generation", e, mode)
+        metrics.generations_total.inc(outcome="error", **labels)
+        
+        if "insufficient_quota" in error_str:
+            return error_result(INSUFFICIENT_QUOTA_MSG)
+        elif "invalid_api_key" in error_str:
+            return error_result(API_KEY_ERROR_MSG)
+        else:
+            return error_result(f"Error: {error_str}")
+
+# The result stored for a failed generation: the message, marked as a failure
+def error_result(message):
+    return message.rstrip() + ERROR_MARKER
+
+# True for the failures stored instead of a generated answer (and for empty answers)
+def is_error_result(text):
+    return not text or text.endswith(ERROR_MARKER)
+
+# True for an answer that stopped early and was kept
+def is_incomplete_result(text):
+    return bool(text) and text.endswith(INCOMPLETE_MARKER)
+
+# The text received for an incomplete answer, without the marker
+def incomplete_text(text):
+    return text[:-len(INCOMPLETE_MARKER)] if is_incomplete_result(text) else text
+
+# Results the user can retry: failed prompts, and answers that stopped early
+def is_retryable_result(text):
+    return is_error_result(text) or is_incomplete_result(text)
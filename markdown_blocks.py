@@ -0,0 +1,118 @@
+import re
+
+# Block-level parser for the markdown the model writes in its answers.
+# parse_markdown makes one pass over the lines (looking at most two lines ahead to
+# recognise a table header) and returns a list of blocks:
+#   ("heading", level, text)
+#   ("paragraph", text)
+#   ("bullets", [item, ...])
+#   ("table", [[cell, ...], ...])     first row is the header
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*)$")
+SEPARATOR_PATTERN = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+RULE_PATTERN = re.compile(r"^(-{3,}|\*{3,}|_{3,})$")
+
+# Tags the model sometimes emits that would confuse the PDF markup
+STRIPPED_TAGS = ("<para>", "</para>", "<b>", "</b>")
+
+# True for a table header separator row such as "| --- | :---: |"
+def is_separator_row(line):
+    return "|" in line and "-" in line and SEPARATOR_PATTERN.match(line) is not None
+
+# Split a table row into cells, dropping the outer pipes but keeping empty inner cells
+def split_row(line):
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|"):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split("|")]
+
+# Remove stray HTML tags and turn <br> into line breaks
+def clean_answer_text(text):
+    for tag in STRIPPED_TAGS:
+        text = text.replace(tag, "")
+    return text.replace("<br>", "\n").replace("<br/>", "\n")
+
+def parse_markdown(text):
+    lines = clean_answer_text(text).split("\n")
+    count = len(lines)
+    blocks = []
+    paragraph = []
+    bullets = []
+    table = None
+    pending_row = ""
+
+    def flush_text():
+        if paragraph:
+            blocks.append(("paragraph", "\n".join(paragraph)))
+            paragraph.clear()
+        if bullets:
+            blocks.append(("bullets", list(bullets)))
+            bullets.clear()
+
+    def flush_table():
+        nonlocal table, pending_row
+        if pending_row:
+            table.append(split_row(pending_row))
+            pending_row = ""
+        blocks.append(("table", table))
+        table = None
+
+    i = 0
+    while i < count:
+        line = lines[i].strip()
+
+        if table is not None:
+            if "|" in line:
+                if is_separator_row(line):
+                    pass
+                elif line.startswith("|") and line.endswith("|"):
+                    if pending_row:
+                        table.append(split_row(pending_row))
+                        pending_row = ""
+                    table.append(split_row(line))
+                else:
+                    # A row broken over several lines - join the pieces
+                    pending_row = f"{pending_row} {line}" if pending_row else line
+                i += 1
+                continue
+            if not line and i + 1 < count and "|" in lines[i + 1]:
+                # Blank line inside a table
+                i += 1
+                continue
+            flush_table()
+
+        if not line or RULE_PATTERN.match(line):
+            flush_text()
+            i += 1
+            continue
+
+        if "|" in line:
+            # A table starts with a header row followed by a separator row,
+            # possibly with one line in between
+            if any(j < count and is_separator_row(lines[j].strip()) for j in (i + 1, i + 2)):
+                flush_text()
+                table = [split_row(line)]
+                i += 1
+                continue
+
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            flush_text()
+            blocks.append(("heading", len(heading.group(1)), heading.group(2).strip()))
+        elif line.startswith("- ") or line.startswith("* "):
+            if paragraph:
+                blocks.append(("paragraph", "\n".join(paragraph)))
+                paragraph.clear()
+            bullets.append(line[2:].strip())
+        else:
+            if bullets:
+                blocks.append(("bullets", list(bullets)))
+                bullets.clear()
+            paragraph.append(line)
+        i += 1
+
+    if table is not None:
+        flush_table()
+    flush_text()
+    return blocks
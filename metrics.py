@@ -0,0 +1,204 @@
+import os
+import tempfile
+import threading
+
+# Serve the metrics at http://127.0.0.1:<port>/metrics (0 disables the endpoint)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+# Also write the metrics to this file on every session scheduler tick (empty disables)
+METRICS_FILE = os.environ.get("METRICS_FILE", "")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram buckets
+SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 20, 30, 50, 75, 100, 150, 250)
+WAIT_BUCKETS = (0, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+ASSEMBLY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30)
+BYTES_BUCKETS = (10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000, 20_000_000)
+
+# All metrics share one lock; updates are a few additions
+_lock = threading.Lock()
+_metrics = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# A monotonically increasing value per label combination
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        _metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+# Observations counted into cumulative buckets, plus their sum and count
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values = {}
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][position] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        for key, (bucket_counts, total, count) in sorted(self._values.items()):
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                labels = _format_labels(self.label_names, key, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {bucket_count}"
+            labels = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+GENERATION_LABELS = ("mode", "prompt")
+
+# Generation, labelled by mode and prompt number (as shown in the UI)
+generation_ttft_seconds = Histogram(
+    "startup_generation_ttft_seconds", "Time from sending a request (the attempt that succeeded) to its first streamed token",
+    GENERATION_LABELS)
+generation_wait_seconds = Histogram(
+    "startup_generation_wait_seconds", "Time a request waited for the rate limiter and retry backoff",
+    GENERATION_LABELS, WAIT_BUCKETS)
+generation_tokens_per_second = Histogram(
+    "startup_generation_tokens_per_second", "Output tokens per second once the stream started",
+    GENERATION_LABELS, TOKENS_PER_SECOND_BUCKETS)
+generation_seconds = Histogram(
+    "startup_generation_seconds", "Total time to produce an answer, including resumed streams",
+    GENERATION_LABELS)
+prompt_assembly_seconds = Histogram(
+    "startup_prompt_assembly_seconds", "Time to build the messages of a request (history and document)",
+    GENERATION_LABELS, ASSEMBLY_BUCKETS)
+generation_input_tokens = Counter(
+    "startup_generation_input_tokens_total", "Estimated prompt tokens sent", GENERATION_LABELS)
+generation_output_tokens = Counter(
+    "startup_generation_output_tokens_total", "Estimated completion tokens received", GENERATION_LABELS)
+generations_total = Counter(
+    "startup_generations_total", "Answers produced, by outcome (complete, cached, incomplete, stopped, error)",
+    GENERATION_LABELS + ("outcome",))
+
+# PDF reports, labelled by mode
+pdf_build_seconds = Histogram(
+    "startup_pdf_build_seconds", "Time to build a PDF report", ("mode",))
+pdf_size_bytes = Histogram(
+    "startup_pdf_size_bytes", "Size of the PDF reports built", ("mode",), BYTES_BUCKETS)
+
+# Failures of generations and reports, by exception type
+errors_total = Counter(
+    "startup_errors_total", "Errors by where they happened and exception type", ("operation", "type", "mode"))
+
+# Count an error; `error` is the exception (or a short type name)
+def record_error(operation, error, mode=None):
+    error_type = error if isinstance(error, str) else type(error).__name__
+    errors_total.inc(operation=operation, type=error_type, mode=mode or "")
+
+# All metrics in the Prometheus text exposition format
+def render_metrics():
+    lines = []
+    with _lock:
+        for metric in _metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Write the metrics to METRICS_FILE (replaced atomically, for a node exporter
+# textfile collector). Registered as a session scheduler task.
+def write_metrics_file(path=None):
+    path = path or METRICS_FILE
+    if not path:
+        return
+    try:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+            tmp_file.write(render_metrics())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write metrics to {path}: {str(e)}")
+
+# Request handler of the metrics endpoint. http.server is only imported when the
+# endpoint is enabled, to keep it off the app's cold start.
+def _metrics_handler():
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # Scrapes are not worth a log line each
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+_server = None
+_server_started = False
+_server_lock = threading.Lock()
+
+# Start the local metrics endpoint once per process, if METRICS_PORT is set.
+# Called on every script run; only the first call does anything.
+def start_metrics_server(port=None):
+    global _server, _server_started
+    port = METRICS_PORT if port is None else port
+    if not port or _server_started:
+        return _server
+    with _server_lock:
+        if not _server_started:
+            _server_started = True
+            from http.server import ThreadingHTTPServer
+            try:
+                _server = ThreadingHTTPServer(("127.0.0.1", port), _metrics_handler())
+            except OSError as e:
+                print(f"Could not start the metrics endpoint on port {port}: {str(e)}")
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            print(f"Metrics served at http://127.0.0.1:{port}/metrics")
+    return _server
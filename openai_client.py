@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+import importlib.util
+from rate_limiter import rate_limiter
+
+# Model used for every generation
+MODEL = "gpt-4.5-preview"
+
+# Key that skips the live API health check (development mode)
+DUMMY_API_KEY = "dummy_key_for_testing"
+
+# How long a health check result is trusted before it is refreshed in the background
+HEALTH_CHECK_TTL_SECONDS = float(os.environ.get("OPENAI_HEALTH_CHECK_TTL_SECONDS", "600"))
+
+# Send every request to a local stand-in server instead of the OpenAI API, e.g.
+# http://127.0.0.1:8765/v1 (see standin_server.py). Empty uses the real API.
+OPENAI_STANDIN_URL = os.environ.get("OPENAI_STANDIN_URL", "")
+
+# Key sent to the stand-in server when no API key is configured
+STANDIN_API_KEY = "sk-standin-local-key"
+
+# Connection pool of the shared HTTP client
+POOL_MAX_CONNECTIONS = int(os.environ.get("OPENAI_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.environ.get("OPENAI_POOL_MAX_KEEPALIVE", "10"))
+POOL_KEEPALIVE_SECONDS = float(os.environ.get("OPENAI_POOL_KEEPALIVE_SECONDS", "120"))
+
+# Use HTTP/2 when the h2 package is installed, unless switched off
+HTTP2_ENABLED = (
+    os.environ.get("OPENAI_HTTP2", "1") != "0"
+    and importlib.util.find_spec("h2") is not None
+)
+
+_lock = threading.Lock()
+_api_key = None
+_api_key_loaded = False
+_client = None
+_http_client = None
+_async_http_client = None
+
+# Last health check result, shared by all sessions
+_health = {"status": "unknown", "detail": "Not checked yet", "checked_at": None}
+_health_thread = None
+
+# Read the API key from the environment (the .env file is loaded by env_file at startup)
+def load_api_key():
+    # Clean any quotes or whitespace
+    api_key = os.environ.get("OPENAI_API_KEY", "").strip().strip("'").strip('"').strip()
+
+    if api_key:
+        # Mask the key for display
+        if len(api_key) > 8:
+            print(f"API key loaded: {api_key[:4]}...{api_key[-4:]}")
+        print(f"API key length: {len(api_key)}")
+    else:
+        print("No API key found")
+        api_key = None
+    return api_key
+
+# Return the process-wide API key, loading it on first use
+def get_api_key():
+    global _api_key, _api_key_loaded
+    if not _api_key_loaded:
+        with _lock:
+            if not _api_key_loaded:
+                _api_key = load_api_key()
+                if not _api_key and OPENAI_STANDIN_URL:
+                    _api_key = STANDIN_API_KEY
+                _api_key_loaded = True
+    return _api_key
+
+# Counts requests going through the shared HTTP client. Uses the transport's
+# "trace" extension to tell new connections from reused ones and to measure how
+# long a request waited for a free connection in the pool.
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    # httpx request event hook - attach a tracer to the outgoing request
+    def on_request(self, request):
+        request.extensions["trace"] = self._make_trace()
+
+    # Same for the async client, where hooks and tracers must be coroutines
+    async def on_async_request(self, request):
+        trace = self._make_trace()
+
+        async def async_trace(event_name, info):
+            trace(event_name, info)
+
+        request.extensions["trace"] = async_trace
+
+    def _make_trace(self):
+        started = time.perf_counter()
+        state = {"acquired": False}
+
+        def trace(event_name, info):
+            if state["acquired"]:
+                return
+            if event_name == "connection.connect_tcp.started":
+                self._record(started, new_connection=True)
+                state["acquired"] = True
+            elif event_name.endswith(".send_request_headers.started"):
+                self._record(started, new_connection=False)
+                state["acquired"] = True
+
+        return trace
+
+    def _record(self, started, new_connection):
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.requests += 1
+            if new_connection:
+                self.new_connections += 1
+            else:
+                self.reused_connections += 1
+            self.queue_wait_total += waited
+            self.queue_wait_max = max(self.queue_wait_max, waited)
+
+    def snapshot(self, open_connections=None):
+        with self._lock:
+            requests = self.requests
+            return {
+                "requests": requests,
+                "open_connections": open_connections,
+                "new_connections": self.new_connections,
+                "reused_connections": self.reused_connections,
+                "reuse_ratio": self.reused_connections / requests if requests else 0.0,
+                "queue_wait_avg": self.queue_wait_total / requests if requests else 0.0,
+                "queue_wait_max": self.queue_wait_max,
+                "max_connections": POOL_MAX_CONNECTIONS,
+                "http2": HTTP2_ENABLED,
+            }
+
+pool_stats = PoolStats()
+
+# Connection limits for the shared clients.
+# Limits comes from whichever httpx flavour the installed openai package uses.
+def _pool_limits():
+    from openai import DEFAULT_CONNECTION_LIMITS
+    return type(DEFAULT_CONNECTION_LIMITS)(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=POOL_KEEPALIVE_SECONDS,
+    )
+
+# Build the long-lived HTTP client shared by every generation in the process
+def _create_http_client():
+    from openai import DefaultHttpxClient
+    return DefaultHttpxClient(
+        limits=_pool_limits(),
+        http2=HTTP2_ENABLED,
+        event_hooks={"request": [pool_stats.on_request], "response": [rate_limiter.on_response]},
+    )
+
+# Build an AsyncOpenAI client with the same pool settings. It must only be used
+# from one event loop - see async_engine.
+def create_async_client():
+    global _async_http_client
+    api_key = get_api_key()
+    if not api_key:
+        return None
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    _async_http_client = DefaultAsyncHttpxClient(
+        limits=_pool_limits(),
+        http2=HTTP2_ENABLED,
+        event_hooks={"request": [pool_stats.on_async_request], "response": [rate_limiter.on_async_response]},
+    )
+    return AsyncOpenAI(api_key=api_key, base_url=OPENAI_STANDIN_URL or None, http_client=_async_http_client,
+                       max_retries=0)
+
+# Return the process-wide OpenAI client, creating it on first use.
+# Returns None when no API key is configured.
+def get_client():
+    global _client, _http_client
+    if _client is None:
+        api_key = get_api_key()
+        if not api_key:
+            return None
+        with _lock:
+            if _client is None:
+                from openai import OpenAI
+                _http_client = _create_http_client()
+                # Retries are done by rate_limiter, which also backs off other callers
+                _client = OpenAI(api_key=api_key, base_url=OPENAI_STANDIN_URL or None, http_client=_http_client,
+                                 max_retries=0)
+                print(f"OpenAI client created (pool size {POOL_MAX_CONNECTIONS}, HTTP/2 {'on' if HTTP2_ENABLED else 'off'})")
+                if OPENAI_STANDIN_URL:
+                    print(f"Sending requests to the stand-in server at {OPENAI_STANDIN_URL}")
+    return _client
+
+# Count connections currently held by the pools of the sync and async HTTP clients,
+# if their transports expose them
+def _count_open_connections():
+    counts = []
+    for http_client in (_http_client, _async_http_client):
+        pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            # Copied first - the async pool changes on the engine's loop thread
+            counts.append(sum(1 for connection in list(connections) if not connection.is_closed()))
+    return sum(counts) if counts else None
+
+# Connection pool statistics: open connections, reuse ratio and queue wait (seconds)
+def get_pool_stats():
+    return pool_stats.snapshot(open_connections=_count_open_connections())
+
+# Send a tiny completion to confirm the key works. Runs on a background thread.
+def _run_health_check():
+    global _health_thread
+    api_key = get_api_key()
+    try:
+        if not api_key:
+            status, detail = "failed", "No API key found"
+        elif api_key == DUMMY_API_KEY:
+            status, detail = "skipped", "Using dummy API key for testing"
+        else:
+            test_response = get_client().chat.completions.create(
+                model=MODEL,
+                messages=[
+                    {"role": "user", "content": "Say OK"}
+                ],
+                max_tokens=5
+            )
+            status, detail = "ok", test_response.choices[0].message.content
+    except Exception as e:
+        status, detail = "failed", str(e)
+
+    print(f"API health check {status}: {detail}")
+    with _lock:
+        _health.update(status=status, detail=detail, checked_at=time.time())
+        _health_thread = None
+
+# Return the cached health check result without blocking.
+# Starts a background refresh when the result is missing or older than the TTL.
+def get_health_status():
+    global _health_thread
+    with _lock:
+        checked_at = _health["checked_at"]
+        stale = checked_at is None or time.time() - checked_at > HEALTH_CHECK_TTL_SECONDS
+        if stale and _health_thread is None:
+            _health_thread = threading.Thread(target=_run_health_check, name="openai-health-check", daemon=True)
+            _health_thread.start()
+        return dict(_health)
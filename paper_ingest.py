@@ -0,0 +1,144 @@
+import io
+import os
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Largest PDF accepted for upload
+PDF_MAX_UPLOAD_MB = float(os.environ.get("PDF_MAX_UPLOAD_MB", "50"))
+
+# Extracted text is cut off after this many characters
+PDF_MAX_TEXT_CHARS = int(os.environ.get("PDF_MAX_TEXT_CHARS", "2000000"))
+
+# Worker processes used to extract pages, and pages handed to a worker at a time
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "8"))
+
+# Extracted text of every paper seen, one file per content hash
+PAPER_CACHE_DIR = os.environ.get("PAPER_CACHE_DIR", os.path.join(".cache", "papers"))
+
+TRUNCATED_NOTE = "\n\n[Text truncated - the document is longer than the extraction limit]"
+
+class PdfTooLargeError(ValueError):
+    pass
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Shared process pool. Workers are spawned rather than forked so they never inherit
+# the server's threads and locks.
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=max(PDF_EXTRACT_WORKERS, 1),
+                                            mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+# Runs in a worker process: text of pages [start, stop) of the PDF at path.
+# Workers open the file themselves, so the PDF bytes are never copied to each task.
+def _extract_pages(path, start, stop):
+    import PyPDF2
+    reader = PyPDF2.PdfReader(path)
+    texts = []
+    for page_number in range(start, stop):
+        try:
+            texts.append(reader.pages[page_number].extract_text() or "")
+        except Exception as e:
+            texts.append(f"[Could not extract page {page_number + 1}: {str(e)}]")
+    return texts
+
+def pdf_content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _cache_path(content_hash):
+    return os.path.join(PAPER_CACHE_DIR, f"{content_hash}.txt")
+
+def load_cached_text(content_hash):
+    try:
+        with open(_cache_path(content_hash), "r", encoding="utf-8") as cache_file:
+            return cache_file.read()
+    except OSError:
+        return None
+
+def _store_cached_text(content_hash, text):
+    try:
+        os.makedirs(PAPER_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=PAPER_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+            tmp_file.write(text)
+        os.replace(tmp_path, _cache_path(content_hash))
+    except OSError as e:
+        print(f"Could not cache extracted paper text: {str(e)}")
+
+# Yield the text of each page in order. Page ranges are extracted in the process
+# pool with at most two ranges per worker in flight, so memory stays bounded.
+def iter_pdf_pages(path, page_count):
+    if page_count <= PDF_PAGES_PER_TASK or PDF_EXTRACT_WORKERS <= 1:
+        # Not worth starting worker processes
+        for page_number in range(page_count):
+            yield _extract_pages(path, page_number, page_number + 1)[0]
+        return
+
+    pool = _get_pool()
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count))
+              for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+    max_in_flight = 2 * PDF_EXTRACT_WORKERS
+    futures = []
+    next_range = 0
+    try:
+        while futures or next_range < len(ranges):
+            while next_range < len(ranges) and len(futures) < max_in_flight:
+                futures.append(pool.submit(_extract_pages, path, *ranges[next_range]))
+                next_range += 1
+            for text in futures.pop(0).result():
+                yield text
+    finally:
+        for future in futures:
+            future.cancel()
+
+# Extract the text of an uploaded PDF. on_page(done, total) is called as pages finish.
+# Results are cached by content hash, so the same paper is only extracted once.
+def extract_pdf_text(data, on_page=None):
+    if len(data) > PDF_MAX_UPLOAD_MB * 1024 * 1024:
+        raise PdfTooLargeError(f"PDF is larger than {PDF_MAX_UPLOAD_MB:g} MB")
+
+    content_hash = pdf_content_hash(data)
+    cached = load_cached_text(content_hash)
+    if cached is not None:
+        return cached
+
+    import PyPDF2
+    page_count = len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+
+    # Workers read the PDF from a temporary file
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as pdf_file:
+            pdf_file.write(data)
+
+        parts = []
+        size = 0
+        truncated = False
+        pages = iter_pdf_pages(path, page_count)
+        for page_number, text in enumerate(pages):
+            if size + len(text) > PDF_MAX_TEXT_CHARS:
+                parts.append(text[:PDF_MAX_TEXT_CHARS - size])
+                truncated = True
+                pages.close()
+                break
+            parts.append(text)
+            size += len(text) + 1
+            if on_page is not None:
+                on_page(page_number + 1, page_count)
+    finally:
+        os.remove(path)
+
+    text = "\n".join(parts)
+    if truncated:
+        text += TRUNCATED_NOTE
+    _store_cached_text(content_hash, text)
+    return text
@@ -0,0 +1,221 @@
+import io
+import os
+import re
+import copy
+import time
+import hashlib
+import threading
+from types import MappingProxyType
+from collections import OrderedDict
+from datetime import datetime
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus.tables import CellStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib import colors
+from markdown_blocks import parse_markdown
+import metrics
+
+# Number of results whose flowables are kept between reports
+PDF_FRAGMENT_CACHE_SIZE = int(os.environ.get("PDF_FRAGMENT_CACHE_SIZE", "512"))
+
+# Flowables built for each result, keyed by a hash of the result text
+_fragments = OrderedDict()
+_fragments_lock = threading.Lock()
+fragment_stats = {"hits": 0, "misses": 0}
+
+# Build the style registry used by the report: reportlab's sample styles plus ours.
+# Called once per process by get_styles.
+def build_styles():
+    sample = getSampleStyleSheet()
+    styles = dict(sample.byName)
+    
+    # Centered copy of Title - the shared sample style itself is left alone
+    styles['ReportTitle'] = ParagraphStyle(name='ReportTitle',
+                                           parent=sample['Title'],
+                                           alignment=TA_CENTER)
+    styles['CustomHeading1'] = ParagraphStyle(name='CustomHeading1',
+                                              fontName='Helvetica-Bold',
+                                              fontSize=16,
+                                              spaceAfter=12,
+                                              textColor=colors.blue)
+    styles['CustomHeading2'] = ParagraphStyle(name='CustomHeading2',
+                                              fontName='Helvetica-Bold',
+                                              fontSize=14,
+                                              spaceAfter=10,
+                                              textColor=colors.darkblue)
+    styles['CustomNormal'] = ParagraphStyle(name='CustomNormal',
+                                            fontName='Helvetica',
+                                            fontSize=10,
+                                            spaceAfter=10)
+    styles['CustomHeading3'] = ParagraphStyle(name='CustomHeading3',
+                                              fontName='Helvetica-Bold',
+                                              fontSize=11,
+                                              spaceBefore=4,
+                                              spaceAfter=6)
+    # Bullet list items - extra indent and line spacing
+    styles['CustomBullet'] = ParagraphStyle(name='CustomBullet',
+                                            parent=styles['CustomNormal'],
+                                            leftIndent=10,
+                                            leading=14)
+    return MappingProxyType(styles)
+
+_styles = None
+_styles_lock = threading.Lock()
+
+# Return the process-wide read-only style registry, shared by every report and thread.
+# Styles are never modified after the registry is built.
+def get_styles():
+    global _styles
+    if _styles is None:
+        with _styles_lock:
+            if _styles is None:
+                _styles = build_styles()
+    return _styles
+
+# Table look shared by every table in the report. Cell commands in a TableStyle are
+# applied to every cell they cover, one by one, so the per-cell look is set on two
+# prebuilt cell styles instead (header row and body rows); reportlab only reads them.
+# The TableStyle keeps the header background and the grid.
+def _table_cell_style(name, **attributes):
+    cell_style = CellStyle(name)
+    cell_style.fontsize = 8  # Smaller font for tables
+    cell_style.valign = 'MIDDLE'
+    cell_style.leftPadding = 2  # Reduce cell padding
+    cell_style.rightPadding = 2
+    for attribute, value in attributes.items():
+        setattr(cell_style, attribute, value)
+    return cell_style
+
+HEADER_CELL_STYLE = _table_cell_style('TableHeader', fontname='Helvetica-Bold', alignment='CENTER')
+BODY_CELL_STYLE = _table_cell_style('TableBody')
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+
+BOLD_PATTERN = re.compile(r"\*\*(.+?)\*\*")
+
+# Escape text for reportlab's paragraph markup and turn **bold** into <b>bold</b>
+def inline_markup(text):
+    text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return BOLD_PATTERN.sub(r"<b>\1</b>", text)
+
+# Emit the flowables for one parsed block
+def _block_flowables(block, styles):
+    kind = block[0]
+    if kind == "heading":
+        return [Paragraph(inline_markup(block[2]), styles["CustomHeading3"])]
+    if kind == "paragraph":
+        return [Paragraph(inline_markup(block[1]), styles["CustomNormal"]), Spacer(1, 8)]
+    if kind == "bullets":
+        # One paragraph per list, one line per item
+        items = "<br/>".join("• " + inline_markup(item) for item in block[1])
+        return [Paragraph(items, styles["CustomBullet"]), Spacer(1, 8)]
+
+    # Table - pad every row to the same number of columns. The cells are already
+    # plain strings, so reportlab's per-cell normalization pass is skipped.
+    rows = [[cell.replace("**", "") for cell in row] for row in block[1]]
+    max_cols = max(len(row) for row in rows)
+    for row in rows:
+        row.extend([""] * (max_cols - len(row)))
+    cell_styles = [[HEADER_CELL_STYLE] * max_cols] + [[BODY_CELL_STYLE] * max_cols for _ in rows[1:]]
+    table = Table(rows, colWidths=[None] * max_cols, repeatRows=1, normalizedData=1, cellStyles=cell_styles)
+    table.setStyle(TABLE_STYLE)
+    return [table, Spacer(1, 12)]
+
+# Turn one result's markdown into flowables
+def build_result_flowables(response_text, styles):
+    content = []
+    for block in parse_markdown(response_text):
+        try:
+            content.extend(_block_flowables(block, styles))
+        except Exception as e:
+            print(f"Error adding {block[0]}: {str(e)}")
+            content.append(Paragraph("Error formatting content", styles["CustomNormal"]))
+    return content
+
+# Return the flowables for one result, building them only for text not seen before.
+# Each report gets its own shallow copies: layout sets its results on the copies,
+# so the cached flowables stay as built and can be shared by concurrent reports.
+def get_result_fragment(response_text, styles):
+    key = hashlib.sha256(response_text.encode("utf-8")).hexdigest()
+    with _fragments_lock:
+        fragment = _fragments.get(key)
+        if fragment is not None:
+            _fragments.move_to_end(key)
+            fragment_stats["hits"] += 1
+    if fragment is None:
+        fragment = build_result_flowables(response_text, styles)
+        with _fragments_lock:
+            _fragments[key] = fragment
+            fragment_stats["misses"] += 1
+            while len(_fragments) > PDF_FRAGMENT_CACHE_SIZE:
+                _fragments.popitem(last=False)
+    return [copy.copy(flowable) for flowable in fragment]
+
+# Function to generate a PDF from all the responses
+def _build_pdf(results, all_prompts):
+    # Create a BytesIO buffer to receive the PDF data
+    buffer = io.BytesIO()
+    
+    # Create the PDF document
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = get_styles()
+    
+    # Create the content
+    content = []
+    
+    # Add title with date
+    title = f"Analysis Report - {datetime.now().strftime('%Y-%m-%d')}"
+    content.append(Paragraph(title, styles["ReportTitle"]))
+    content.append(Spacer(1, 20))
+    
+    # Process all responses
+    current_section = None
+    
+    for idx, prompt_info in enumerate(all_prompts):
+        # Only include prompts that have responses
+        if idx not in results:
+            continue
+            
+        section_name, num, title, _ = prompt_info
+        
+        # Add section header if we're in a new section
+        if section_name != current_section:
+            content.append(Spacer(1, 10))
+            content.append(Paragraph(section_name, styles["CustomHeading1"]))
+            content.append(Spacer(1, 10))
+            current_section = section_name
+        
+        # Add the prompt number and title
+        prompt_title = f"{num}. {title}"
+        content.append(Paragraph(prompt_title, styles["CustomHeading2"]))
+        
+        # Add the response - cached per result, so only new answers are parsed
+        content.extend(get_result_fragment(results[idx], styles))
+        content.append(Spacer(1, 15))
+    
+    # Build the PDF
+    doc.build(content)
+    
+    # Get the PDF data
+    pdf_data = buffer.getvalue()
+    buffer.close()
+    
+    return pdf_data
+
+# Generate the PDF report, recording its build time, size and failures in the
+# metrics (`mode` labels them)
+def generate_pdf(results, all_prompts, mode=None):
+    started = time.monotonic()
+    try:
+        pdf_data = _build_pdf(results, all_prompts)
+    except Exception as e:
+        metrics.record_error("pdf", e, mode)
+        raise
+    metrics.pdf_build_seconds.observe(time.monotonic() - started, mode=mode or "")
+    metrics.pdf_size_bytes.observe(len(pdf_data), mode=mode or "")
+    return pdf_data
@@ -0,0 +1,131 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from generation import generate_response, is_error_result, error_result
+from context_builder import schedule_summary
+
+# Number of prompts generated ahead of the one being shown (0 disables prefetching)
+PREFETCH_LOOKAHEAD = int(os.environ.get("PREFETCH_LOOKAHEAD", "1"))
+
+# Worker threads shared by all sessions for prefetching
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", "4"))
+
+_executor = ThreadPoolExecutor(max_workers=max(PREFETCH_WORKERS, 1), thread_name_prefix="prefetch")
+
+# One prompt being generated ahead of time. The text grows while streaming.
+class PrefetchJob:
+    def __init__(self, idx):
+        self.idx = idx
+        self.text = ""
+        self.result = None
+        self.done = threading.Event()
+        self.cancelled = threading.Event()
+
+    def update(self, text):
+        self.text = text
+
+    def finish(self, result):
+        self.result = result
+        self.done.set()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.done.set()
+
+    # Block until the job finishes, passing the partial text to on_update while it streams.
+    # Returns None if the job was cancelled or failed.
+    def wait(self, on_update=None, interval=0.1):
+        shown = None
+        while not self.done.wait(interval):
+            if on_update is not None and self.text and self.text is not shown:
+                shown = self.text
+                on_update(shown)
+        if self.cancelled.is_set() or is_error_result(self.result):
+            return None
+        return self.result
+
+# Prefetch state of one browser session, kept in st.session_state.
+# Jobs are tied to the (mode, idea) they were started for.
+class SessionPrefetcher:
+    def __init__(self, lookahead=PREFETCH_LOOKAHEAD):
+        self.lookahead = lookahead
+        self.key = None
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    # Cancel every outstanding prefetch (idea or mode changed)
+    def cancel_all(self):
+        with self._lock:
+            for job in self.jobs.values():
+                job.cancel()
+            self.jobs = {}
+            self.key = None
+
+    # Hand over the prefetched job for idx, if any, and stop tracking it
+    def take(self, idx, key):
+        with self._lock:
+            if key != self.key:
+                return None
+            return self.jobs.pop(idx, None)
+
+    # Start generating the prompts after current_idx that have no result yet.
+    # The prompts are chained, so they run one after another on a single worker.
+    def schedule(self, current_idx, key, all_prompts, idea, results, mode=None):
+        if self.lookahead <= 0:
+            return
+        if key != self.key:
+            self.cancel_all()
+
+        with self._lock:
+            self.key = key
+            last_idx = min(current_idx + self.lookahead, len(all_prompts) - 1)
+            new_jobs = []
+            for idx in range(current_idx + 1, last_idx + 1):
+                if idx in results:
+                    continue
+                if idx in self.jobs and not self.jobs[idx].cancelled.is_set():
+                    continue
+                job = PrefetchJob(idx)
+                self.jobs[idx] = job
+                new_jobs.append(job)
+            if not new_jobs:
+                return
+
+            # Earlier prompts still being prefetched - the new ones must build on their answers
+            prior_jobs = [
+                job for idx, job in sorted(self.jobs.items())
+                if idx < new_jobs[0].idx and not job.cancelled.is_set()
+            ]
+
+        _executor.submit(_run_jobs, new_jobs, prior_jobs, all_prompts, idea, dict(results), mode)
+
+def _run_jobs(jobs, prior_jobs, all_prompts, idea, results, mode=None):
+    for prior in prior_jobs:
+        prior.done.wait()
+        if prior.cancelled.is_set() or is_error_result(prior.result):
+            for job in jobs:
+                job.cancel()
+            return
+        results[prior.idx] = prior.result
+
+    for job in jobs:
+        if job.cancelled.is_set():
+            continue
+        try:
+            _, _, _, prompt = all_prompts[job.idx]
+            result = generate_response(prompt, idea, job.idx, all_prompts, results,
+                                       on_update=job.update, should_stop=job.cancelled.is_set, mode=mode)
+        except Exception as e:
+            print(f"Prefetch of prompt {job.idx} failed: {str(e)}")
+            result = error_result(f"Error: {str(e)}")
+        if job.cancelled.is_set():
+            continue
+        job.finish(result)
+        if is_error_result(result):
+            # Later prompts would be built on a failed answer - let the UI generate them
+            for later in jobs:
+                if later.idx > job.idx:
+                    later.cancel()
+            return
+        results[job.idx] = result
+        schedule_summary(result)
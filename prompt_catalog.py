@@ -0,0 +1,363 @@
+import os
+import re
+import threading
+import time
+
+# Prompt files used by each mode; anything else falls back to the research prompts
+MODE_PROMPT_FILES = {
+    "analyze": "startup_analysis_prompts.txt",
+    "plan": "startup_plans_prompts.txt",
+    "neurips": "neurips_review.txt",
+    "iclr": "iclr_review.txt",
+    "research": "ai_research_paper_prompts.txt",
+}
+
+# How long a loaded catalog is trusted before its file's mtime is checked again.
+# Streamlit reruns the script on every click, so this keeps Back/Next free of file I/O.
+CATALOG_RECHECK_SECONDS = float(os.environ.get("PROMPT_CATALOG_RECHECK_SECONDS", "2"))
+
+# Optional dependency annotation at the end of a section or prompt heading,
+# e.g. "[depends: 1, 3]" or "[depends: none]"
+DEPENDS_PATTERN = re.compile(r"\s*\[depends:\s*([^\]]*)\]", re.IGNORECASE)
+
+# Strip a "[depends: ...]" annotation from a heading.
+# Returns the clean heading and the referenced prompt numbers (None when not annotated).
+def split_dependencies(heading):
+    match = DEPENDS_PATTERN.search(heading)
+    if not match:
+        return heading, None
+    refs = [ref.strip() for ref in match.group(1).split(",") if ref.strip()]
+    if [ref.lower() for ref in refs] == ["none"]:
+        refs = []
+    return (heading[:match.start()] + heading[match.end():]).strip(), tuple(refs)
+
+# Compiled prompt file: the parsed sections plus the flat (section, num, title, content) index.
+# Catalogs are shared by every session in the process, so treat them as read-only.
+class PromptCatalog:
+    def __init__(self, path, mtime, sections):
+        self.path = path
+        self.mtime = mtime
+        self.sections = {}
+        declared = []
+        for section_heading, prompts in sections.items():
+            section_name, section_refs = split_dependencies(section_heading)
+            clean_prompts = []
+            for num, title, content in prompts:
+                title, refs = split_dependencies(title)
+                clean_prompts.append((num, title, content))
+                declared.append(refs if refs is not None else section_refs)
+            self.sections[section_name] = tuple(clean_prompts)
+        self.prompts = tuple(
+            (section_name, num, title, content)
+            for section_name, prompts in self.sections.items()
+            for num, title, content in prompts
+        )
+        self.dependencies = self._resolve_dependencies(declared)
+        self.checked_at = time.monotonic()
+
+    # Turn declared prompt numbers into flat indices. Prompts without a declaration
+    # depend on every earlier prompt, which keeps the original sequential chain.
+    def _resolve_dependencies(self, declared):
+        index_by_num = {}
+        for idx, (_, num, _, _) in enumerate(self.prompts):
+            if num:
+                index_by_num.setdefault(num, idx)
+
+        dependencies = []
+        for idx, refs in enumerate(declared):
+            if refs is None:
+                dependencies.append(tuple(range(idx)))
+                continue
+            resolved = []
+            for ref in refs:
+                dep_idx = index_by_num.get(ref)
+                if dep_idx is None or dep_idx >= idx:
+                    # Only earlier prompts can be dependencies, which keeps the graph acyclic
+                    print(f"Ignoring dependency '{ref}' of prompt {idx + 1} in {self.path}")
+                    continue
+                resolved.append(dep_idx)
+            dependencies.append(tuple(sorted(set(resolved))))
+        return tuple(dependencies)
+
+    def __len__(self):
+        return len(self.prompts)
+
+# Process-wide cache: path -> PromptCatalog
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+# Pick the parser for a prompt file based on its name
+def get_prompt_parser(file_path):
+    return PROMPT_PARSERS.get(os.path.basename(file_path))
+
+# Return the compiled catalog for a prompt file, re-parsing only when the file changed
+def load_catalog(file_path):
+    catalog = _catalogs.get(file_path)
+    now = time.monotonic()
+    if catalog is not None and now - catalog.checked_at < CATALOG_RECHECK_SECONDS:
+        return catalog
+
+    mtime = os.stat(file_path).st_mtime_ns
+    if catalog is not None and catalog.mtime == mtime:
+        catalog.checked_at = now
+        return catalog
+
+    with _catalogs_lock:
+        # Another session may have rebuilt it while we were waiting
+        catalog = _catalogs.get(file_path)
+        if catalog is not None and catalog.mtime == mtime:
+            catalog.checked_at = now
+            return catalog
+
+        parser = get_prompt_parser(file_path)
+        if parser is None:
+            print(f"Unknown prompt file: {file_path}")
+            sections = {}
+        else:
+            with open(file_path, "r") as file:
+                sections = parser(file.read())
+
+        catalog = PromptCatalog(file_path, mtime, sections)
+        _catalogs[file_path] = catalog
+        print(f"Loaded prompt catalog {file_path}: {len(catalog)} prompts")
+        return catalog
+
+# Return the catalog for a mode ('analyze', 'plan', 'neurips', 'iclr' or research)
+def load_mode_catalog(mode):
+    return load_catalog(MODE_PROMPT_FILES.get(mode, MODE_PROMPT_FILES["research"]))
+
+# Read the prompts from the specified file
+def load_prompts(file_path):
+    return load_catalog(file_path).sections
+
+# Parse the analysis prompts format
+def parse_analysis_prompts(content):
+    # Split the content into sections
+    sections = {}
+    current_section = None
+    current_prompts = []
+    
+    lines = content.split('\n')
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith('### '):
+            if current_section:
+                sections[current_section] = current_prompts
+            current_section = line.replace('### ', '').strip()
+            current_prompts = []
+        elif line.startswith('**') and '**' in line and '.' in line:
+            # This is a prompt title
+            parts = line.split('.')
+            prompt_number = parts[0].replace('**', '').strip()
+            if len(parts) > 1:
+                prompt_title = parts[1].replace('**', '').strip()
+                
+                # Find the full prompt content
+                i += 1
+                prompt_content = ""
+                while i < len(lines) and not (lines[i].startswith('**') or lines[i].startswith('---') or lines[i].startswith('###')):
+                    if lines[i].strip():
+                        prompt_content += lines[i] + '\n'
+                    i += 1
+                i -= 1  # Adjust for next iteration
+                
+                current_prompts.append((prompt_number, prompt_title, prompt_content))
+        i += 1
+    
+    # Add the last section
+    if current_section:
+        sections[current_section] = current_prompts
+    
+    return sections
+
+# Parse the plan prompts format
+def parse_plan_prompts(content):
+    # Split the content into sections
+    sections = {}
+    current_section = None
+    current_prompts = []
+    
+    lines = content.split('\n')
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        # Check for section headers which use ## pattern
+        if line.startswith('## '):
+            if current_section:
+                sections[current_section] = current_prompts
+            current_section = line.replace('## ', '').strip().replace('**', '')
+            current_prompts = []
+        # Check for prompt headers which use ### pattern
+        elif line.startswith('### '):
+            prompt_line = line.replace('### ', '').strip().replace('**', '')
+            
+            # Extract prompt number and title
+            if "**" in prompt_line:
+                prompt_line = prompt_line.replace('**', '')
+            
+            # Parse the prompt number and title
+            if '. ' in prompt_line:
+                parts = prompt_line.split('. ', 1)
+                prompt_number = parts[0]
+                prompt_title = parts[1] if len(parts) > 1 else prompt_line
+            else:
+                prompt_number = ""
+                prompt_title = prompt_line
+            
+            # Find the prompt content (usually on the next line)
+            i += 1
+            prompt_content = ""
+            # Plans prompts content is typically enclosed in > symbols
+            while i < len(lines) and lines[i].strip() and not (lines[i].startswith('##') or lines[i].startswith('---')):
+                content_line = lines[i].strip()
+                if content_line.startswith('>'):
+                    content_line = content_line[1:].strip()  # Remove the > and any space
+                prompt_content += content_line + '\n'
+                i += 1
+            i -= 1  # Adjust for next iteration
+            
+            current_prompts.append((prompt_number, prompt_title, prompt_content))
+        i += 1
+    
+    # Add the last section
+    if current_section:
+        sections[current_section] = current_prompts
+    
+    return sections
+
+# Parse the research paper prompts format
+def parse_research_prompts(content):
+    # Split the content into sections
+    sections = {}
+    current_section = None
+    current_prompts = []
+    
+    lines = content.split('\n')
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        # Check for section headers which use ## pattern
+        if line.startswith('## '):
+            if current_section:
+                sections[current_section] = current_prompts
+            current_section = line.replace('## ', '').strip()
+            current_prompts = []
+        # Check for subsection headers which use ### pattern 
+        elif line.startswith('### '):
+            prompt_title = line.replace('### ', '').strip()
+            prompt_number = ""  # No specific numbering in research paper format
+            
+            # Find the prompt content (bullet points that follow)
+            i += 1
+            prompt_content = ""
+            while i < len(lines) and not (lines[i].startswith('##') or lines[i].startswith('# ')):
+                if lines[i].strip():
+                    # Include all bullet points and text under this subsection
+                    prompt_content += lines[i] + '\n'
+                i += 1
+            i -= 1  # Adjust for next iteration
+            
+            # Add to the current section
+            if prompt_content.strip():
+                current_prompts.append((prompt_number, prompt_title, prompt_content))
+        i += 1
+    
+    # Add the last section
+    if current_section:
+        sections[current_section] = current_prompts
+    
+    return sections
+
+# Parse the NeurIPS review prompts format
+def parse_neurips_prompts(content):
+    # Split the content into sections
+    sections = {"NeurIPS Review": []}
+    current_prompts = []
+    
+    lines = content.split('\n')
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        # Look for numbered prompts (e.g. "1. Briefly summarize...")
+        if line and line[0].isdigit() and ". " in line:
+            parts = line.split(". ", 1)
+            prompt_number = parts[0]
+            prompt_title = parts[1]
+            
+            # Get the content (everything until the next numbered prompt)
+            i += 1
+            prompt_content = ""
+            while i < len(lines) and not (i < len(lines) and lines[i].strip() and lines[i].strip()[0].isdigit() and ". " in lines[i].strip()):
+                if lines[i].strip():
+                    prompt_content += lines[i] + '\n'
+                i += 1
+            i -= 1  # Adjust for next iteration
+            
+            # Create a properly formatted prompt that will work with the paper text
+            formatted_prompt = f"""Based on the following research paper, {prompt_title}
+
+Paper text:
+<idea>
+
+Please provide a detailed response addressing this aspect of the review."""
+            
+            # Add to the prompts
+            current_prompts.append((prompt_number, prompt_title, formatted_prompt))
+        i += 1
+    
+    # Add all prompts to the NeurIPS Review section
+    sections["NeurIPS Review"] = current_prompts
+    
+    return sections
+
+# Parse the ICLR review prompts format
+def parse_iclr_prompts(content):
+    # Split the content into sections
+    sections = {"ICLR Review": []}
+    current_prompts = []
+    
+    lines = content.split('\n')
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        # Look for numbered prompts (e.g. "1. Summarize...")
+        if line and line[0].isdigit() and ". " in line:
+            parts = line.split(". ", 1)
+            prompt_number = parts[0]
+            prompt_title = parts[1]
+            
+            # Get the content (everything until the next numbered prompt)
+            i += 1
+            prompt_content = ""
+            while i < len(lines) and not (i < len(lines) and lines[i].strip() and lines[i].strip()[0].isdigit() and ". " in lines[i].strip()):
+                if lines[i].strip():
+                    prompt_content += lines[i] + '\n'
+                i += 1
+            i -= 1  # Adjust for next iteration
+            
+            # Create a properly formatted prompt that will work with the paper text
+            formatted_prompt = f"""Based on the following research paper, {prompt_title}
+
+Paper text:
+<idea>
+
+Please provide a detailed response addressing this aspect of the review."""
+            
+            # Add to the prompts
+            current_prompts.append((prompt_number, prompt_title, formatted_prompt))
+        i += 1
+    
+    # Add all prompts to the ICLR Review section
+    sections["ICLR Review"] = current_prompts
+    
+    return sections
+
+
+PROMPT_PARSERS = {
+    "startup_analysis_prompts.txt": parse_analysis_prompts,
+    "startup_plans_prompts.txt": parse_plan_prompts,
+    "ai_research_paper_prompts.txt": parse_research_prompts,
+    "neurips_review.txt": parse_neurips_prompts,
+    "iclr_review.txt": parse_iclr_prompts,
+}
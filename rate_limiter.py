@@ -0,0 +1,205 @@
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+
+# Requests and tokens per minute allowed for this process. Replaced by the limits the
+# API reports in its x-ratelimit-* response headers once the first response arrives.
+OPENAI_RPM_LIMIT = float(os.environ.get("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = float(os.environ.get("OPENAI_TPM_LIMIT", "200000"))
+
+# Retries of rate-limited (429) and server (5xx) errors, with jittered exponential backoff
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "5"))
+OPENAI_BACKOFF_BASE_SECONDS = float(os.environ.get("OPENAI_BACKOFF_BASE_SECONDS", "1"))
+OPENAI_BACKOFF_MAX_SECONDS = float(os.environ.get("OPENAI_BACKOFF_MAX_SECONDS", "60"))
+
+DURATION_PART_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+# Parse the reset durations used in rate-limit headers ("20ms", "1.5s", "6m0s")
+def parse_duration(value):
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+# Tokens a request counts against the tokens-per-minute limit: the prompt
+# (about four characters per token) plus the completion it may produce
+def request_tokens(messages, max_tokens):
+    return sum(len(message.get("content") or "") for message in messages) // 4 + 1 + (max_tokens or 0)
+
+# A bucket holding up to `capacity` units that refills at capacity per minute.
+# The level may go negative: a request is let through once the debt is repaid.
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    # Take amount now and return how long the caller must wait before using it
+    def reserve(self, amount, now):
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        self.level -= amount
+        if self.level >= 0:
+            return 0.0
+        return -self.level * 60 / self.capacity
+
+    # Align with the limit and remaining allowance reported by the API
+    def observe(self, limit, remaining, now):
+        self._refill(now)
+        if limit:
+            self.capacity = limit
+        if remaining is not None:
+            self.level = min(self.level, remaining)
+
+# Process-wide limiter shared by every client and session: one bucket for requests,
+# one for tokens. Callers reserve before sending and wait out the returned delay.
+class RateLimiter:
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens):
+        with self._lock:
+            now = time.monotonic()
+            delay = max(self.requests.reserve(1, now), self.tokens.reserve(tokens, now), self.paused_until - now)
+            if delay > 0:
+                self.waits += 1
+                self.wait_seconds += delay
+            return max(delay, 0.0)
+
+    def acquire(self, tokens):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    # Returns the seconds waited
+    async def acquire_async(self, tokens):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    # Hold every request until `seconds` from now (after a 429)
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    # httpx response event hook - learn the real limits from the x-ratelimit-* headers
+    def on_response(self, response):
+        headers = response.headers
+        try:
+            limit_requests = headers.get("x-ratelimit-limit-requests")
+            remaining_requests = headers.get("x-ratelimit-remaining-requests")
+            limit_tokens = headers.get("x-ratelimit-limit-tokens")
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            with self._lock:
+                now = time.monotonic()
+                if limit_requests or remaining_requests:
+                    self.requests.observe(float(limit_requests) if limit_requests else None,
+                                          float(remaining_requests) if remaining_requests else None, now)
+                if limit_tokens or remaining_tokens:
+                    self.tokens.observe(float(limit_tokens) if limit_tokens else None,
+                                        float(remaining_tokens) if remaining_tokens else None, now)
+        except ValueError as e:
+            print(f"Could not read rate limit headers: {str(e)}")
+
+    async def on_async_response(self, response):
+        self.on_response(response)
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            return {
+                "requests_per_minute": self.requests.capacity,
+                "requests_available": self.requests.level,
+                "tokens_per_minute": self.tokens.capacity,
+                "tokens_available": self.tokens.level,
+                "waits": self.waits,
+                "wait_seconds": self.wait_seconds,
+                "retries": self.retries,
+            }
+
+rate_limiter = RateLimiter(OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT)
+
+# True for errors worth retrying: rate limits (but not an exhausted quota),
+# server errors and dropped connections
+def is_retryable(error):
+    import openai
+    if isinstance(error, openai.RateLimitError):
+        return "insufficient_quota" not in str(error)
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return isinstance(error, openai.APIConnectionError)
+
+# Seconds to wait before retry number `attempt` (0-based): the server's Retry-After
+# when it sends one, otherwise full-jitter exponential backoff
+def backoff_delay(error, attempt):
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = parse_duration(response.headers.get("retry-after"))
+        if retry_after is not None:
+            return min(retry_after, OPENAI_BACKOFF_MAX_SECONDS)
+    return random.uniform(0, min(OPENAI_BACKOFF_MAX_SECONDS, OPENAI_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+def _before_retry(error, attempt):
+    delay = backoff_delay(error, attempt)
+    print(f"OpenAI request failed ({str(error)[:100]}) - retry {attempt + 1} of {OPENAI_MAX_RETRIES} in {delay:.1f}s")
+    with rate_limiter._lock:
+        rate_limiter.retries += 1
+    if getattr(error, "status_code", None) == 429:
+        # Everyone backs off, not just this caller
+        rate_limiter.pause(delay)
+    return delay
+
+# Call send() once the limiter allows it, retrying retryable errors
+def call_with_retries(send, tokens):
+    attempt = 0
+    while True:
+        rate_limiter.acquire(tokens)
+        try:
+            return send()
+        except Exception as e:
+            if attempt >= OPENAI_MAX_RETRIES or not is_retryable(e):
+                raise
+            time.sleep(_before_retry(e, attempt))
+            attempt += 1
+
+# Async version of call_with_retries; send is a coroutine function.
+# on_wait(seconds) is called for every limiter wait and retry backoff.
+async def call_with_retries_async(send, tokens, on_wait=None):
+    attempt = 0
+    while True:
+        waited = await rate_limiter.acquire_async(tokens)
+        if on_wait is not None and waited > 0:
+            on_wait(waited)
+        try:
+            return await send()
+        except Exception as e:
+            if attempt >= OPENAI_MAX_RETRIES or not is_retryable(e):
+                raise
+            delay = _before_retry(e, attempt)
+            if on_wait is not None:
+                on_wait(delay)
+            await asyncio.sleep(delay)
+            attempt += 1
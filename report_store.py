@@ -0,0 +1,70 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+# Directory holding generated reports, one file per distinct set of results
+REPORT_STORE_DIR = os.environ.get("REPORT_STORE_DIR", os.path.join(tempfile.gettempdir(), "startup-reports"))
+
+# Oldest reports beyond this count are deleted
+REPORT_STORE_MAX_FILES = int(os.environ.get("REPORT_STORE_MAX_FILES", "200"))
+
+# Bump when the report layout changes so stale artifacts are not served
+REPORT_FORMAT_VERSION = 2
+
+_store_lock = threading.Lock()
+
+# Hash of everything that ends up in the report
+def report_key(mode, results, all_prompts):
+    payload = json.dumps(
+        {
+            "version": REPORT_FORMAT_VERSION,
+            "mode": mode,
+            "results": [
+                [idx, all_prompts[idx][0], all_prompts[idx][1], all_prompts[idx][2], results[idx]]
+                for idx in sorted(results)
+                if idx < len(all_prompts)
+            ],
+        },
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _report_path(key):
+    return os.path.join(REPORT_STORE_DIR, f"{key}.pdf")
+
+# Path of the stored report for key, or None if it has not been generated yet
+def find_report(key):
+    path = _report_path(key)
+    return path if os.path.exists(path) else None
+
+# Store a generated report under key and return its path.
+# The file is written to a temporary name first so readers never see a partial PDF.
+def save_report(key, pdf_data):
+    os.makedirs(REPORT_STORE_DIR, exist_ok=True)
+    path = _report_path(key)
+    fd, tmp_path = tempfile.mkstemp(dir=REPORT_STORE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as tmp_file:
+        tmp_file.write(pdf_data)
+    os.replace(tmp_path, path)
+    _evict_old_reports()
+    return path
+
+def _evict_old_reports():
+    with _store_lock:
+        try:
+            entries = [
+                entry for entry in os.scandir(REPORT_STORE_DIR)
+                if entry.is_file() and entry.name.endswith(".pdf")
+            ]
+        except FileNotFoundError:
+            return
+        if len(entries) <= REPORT_STORE_MAX_FILES:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - REPORT_STORE_MAX_FILES]:
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                print(f"Could not remove old report {entry.path}: {str(e)}")
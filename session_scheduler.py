@@ -0,0 +1,144 @@
+import os
+import time
+import threading
+
+# Seconds between scheduler ticks (keep-alive and housekeeping)
+SESSION_TICK_SECONDS = float(os.environ.get("SESSION_TICK_SECONDS", "15"))
+
+# One entry per live browser session
+class SessionEntry:
+    def __init__(self, session_id, on_close=None):
+        self.session_id = session_id
+        self.heartbeat = 0
+        self.registered_at = time.time()
+        self.last_seen = self.registered_at
+        self.on_close = on_close
+
+# True while Streamlit still has a connected session with this id.
+# Outside a Streamlit server (no runtime) every session counts as live.
+def _streamlit_session_active(session_id):
+    from streamlit import runtime
+    if not runtime.exists():
+        return True
+    return runtime.get_instance().is_active_session(session_id)
+
+# A single process-wide thread that ticks every live session and runs housekeeping
+# tasks. Sessions that disconnect are dropped (and their on_close callback run) on
+# the next tick. The thread is restarted by the next register() call if it ever dies.
+class SessionScheduler:
+    def __init__(self, tick_seconds, is_active=_streamlit_session_active):
+        self.tick_seconds = tick_seconds
+        self.is_active = is_active
+        self.ticks = 0
+        self.closed_sessions = 0
+        self.restarts = 0
+        self._sessions = {}
+        self._tasks = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._thread is not None:
+                self.restarts += 1
+                print("Session scheduler thread stopped - restarting it")
+            self._thread = threading.Thread(target=self._run, name="session-scheduler", daemon=True)
+            self._thread.start()
+
+    # Track a session (idempotent); called on every script run
+    def register(self, session_id, on_close=None):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = SessionEntry(session_id, on_close)
+                self._sessions[session_id] = entry
+            elif on_close is not None:
+                entry.on_close = on_close
+            entry.last_seen = time.time()
+        self._ensure_running()
+        return entry
+
+    def unregister(self, session_id):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._close(entry)
+
+    # Run task() on every tick, e.g. cache trimming
+    def add_task(self, task):
+        with self._lock:
+            if task not in self._tasks:
+                self._tasks.append(task)
+
+    def heartbeat(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry.heartbeat if entry is not None else 0
+
+    def _close(self, entry):
+        self.closed_sessions += 1
+        if entry.on_close is not None:
+            try:
+                entry.on_close()
+            except Exception as e:
+                print(f"Error closing session {entry.session_id}: {str(e)}")
+
+    def tick(self):
+        with self._lock:
+            entries = list(self._sessions.values())
+            tasks = list(self._tasks)
+        for entry in entries:
+            try:
+                active = self.is_active(entry.session_id)
+            except Exception as e:
+                print(f"Could not check session {entry.session_id}: {str(e)}")
+                active = True
+            if active:
+                entry.heartbeat += 1
+            else:
+                self.unregister(entry.session_id)
+        for task in tasks:
+            try:
+                task()
+            except Exception as e:
+                print(f"Session housekeeping task failed: {str(e)}")
+        self.ticks += 1
+
+    def _run(self):
+        while True:
+            time.sleep(self.tick_seconds)
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Session scheduler tick failed: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "threads": threading.active_count(),
+                "scheduler_alive": self._thread is not None and self._thread.is_alive(),
+                "ticks": self.ticks,
+                "closed_sessions": self.closed_sessions,
+                "restarts": self.restarts,
+            }
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+# Return the process-wide session scheduler
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = SessionScheduler(SESSION_TICK_SECONDS)
+    return _scheduler
+
+# Id of the Streamlit session running the current script, or None outside Streamlit
+def current_session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
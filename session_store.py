@@ -0,0 +1,308 @@
+import os
+import sys
+import time
+import zlib
+import sqlite3
+import secrets
+import threading
+import weakref
+from collections.abc import MutableMapping
+
+# Durable copy of every session's idea, mode, position and answers
+SESSION_STORE_PATH = os.environ.get("SESSION_STORE_PATH", os.path.join(".cache", "sessions.sqlite3"))
+
+# Sessions not used for this long are deleted from disk
+SESSION_STORE_TTL_SECONDS = float(os.environ.get("SESSION_STORE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# Answers of sessions idle for this long are dropped from memory (they stay on disk)
+SESSION_IDLE_SECONDS = float(os.environ.get("SESSION_IDLE_SECONDS", "600"))
+
+# Memory all sessions' answers may use together; least recently used sessions are
+# dropped from memory (spilled to the store) beyond it. 0 disables the cap.
+SESSION_MEMORY_LIMIT_MB = float(os.environ.get("SESSION_MEMORY_LIMIT_MB", "256"))
+
+# Random id that names a session in the store (kept in the page URL)
+def new_session_token():
+    return secrets.token_urlsafe(16)
+
+# SQLite (WAL) store of sessions and their answers. One connection is shared by
+# all threads, guarded by a lock - the same approach as the response cache.
+class SessionStore:
+    def __init__(self, path, ttl_seconds):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " token TEXT PRIMARY KEY,"
+                " idea TEXT NOT NULL,"
+                " mode TEXT,"
+                " current_prompt_index INTEGER NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " token TEXT NOT NULL,"
+                " idx INTEGER NOT NULL,"
+                " result TEXT NOT NULL,"
+                " PRIMARY KEY (token, idx))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    # (idea, mode, current_prompt_index) of a stored session, or None
+    def get_session(self, token):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT idea, mode, current_prompt_index FROM sessions WHERE token = ?", (token,)
+            ).fetchone()
+        return tuple(row) if row is not None else None
+
+    def save_session(self, token, idea, mode, current_prompt_index):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (token, idea, mode, current_prompt_index, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (token, idea, mode, current_prompt_index, time.time()),
+            )
+            conn.commit()
+
+    def get_results(self, token):
+        with self._lock:
+            rows = self._connect().execute("SELECT idx, result FROM results WHERE token = ?", (token,)).fetchall()
+        return dict(rows)
+
+    def put_result(self, token, idx, result):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO results (token, idx, result) VALUES (?, ?, ?)", (token, idx, result))
+            conn.execute("UPDATE sessions SET updated_at = ? WHERE token = ?", (time.time(), token))
+            conn.commit()
+
+    def delete_result(self, token, idx):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM results WHERE token = ? AND idx = ?", (token, idx))
+            conn.commit()
+
+    def clear_results(self, token):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM results WHERE token = ?", (token,))
+            conn.commit()
+
+    # Delete sessions (and their answers) unused for longer than the TTL
+    def prune(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM results WHERE token IN (SELECT token FROM sessions WHERE updated_at < ?)", (cutoff,))
+            removed = conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+            conn.commit()
+        return removed
+
+_store = None
+_store_lock = threading.Lock()
+
+# Return the process-wide session store
+def get_session_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore(SESSION_STORE_PATH, SESSION_STORE_TTL_SECONDS)
+                try:
+                    _store.prune()
+                except sqlite3.Error as e:
+                    print(f"Could not prune the session store: {str(e)}")
+    return _store
+
+# Every SessionResults in the process (by id - mappings are not hashable), for idle eviction
+_live_results = weakref.WeakValueDictionary()
+
+# A session's answers, {prompt index: text}. Works like the dict it replaces, but every
+# change is written to the store as it happens, and the answers are only read from
+# disk when first needed - again after unload() dropped them from memory.
+# In memory the answers are kept zlib-compressed. The answer on screen, whose index
+# the app sets as `displayed`, is also kept as text, since every rerun reads it;
+# other reads (history, report keys) decompress and do not replace it.
+class SessionResults(MutableMapping):
+    def __init__(self, store, token):
+        self.store = store
+        self.token = token
+        self.idea = ""
+        self.last_used = time.monotonic()
+        self._displayed = None
+        self._data = None
+        self._hot = None
+        self._lock = threading.RLock()
+        _live_results[id(self)] = self
+
+    def _loaded(self):
+        self.last_used = time.monotonic()
+        if self._data is None:
+            try:
+                stored = self.store.get_results(self.token)
+            except sqlite3.Error as e:
+                print(f"Could not load stored answers: {str(e)}")
+                stored = {}
+            self._data = {idx: zlib.compress(result.encode("utf-8")) for idx, result in stored.items()}
+        return self._data
+
+    def __getitem__(self, idx):
+        with self._lock:
+            compressed = self._loaded()[idx]
+            if self._hot is not None and self._hot[0] == idx:
+                return self._hot[1]
+            result = zlib.decompress(compressed).decode("utf-8")
+            if idx == self._displayed:
+                self._hot = (idx, result)
+            return result
+
+    def __setitem__(self, idx, result):
+        with self._lock:
+            self._loaded()[idx] = zlib.compress(result.encode("utf-8"))
+            if idx == self._displayed:
+                self._hot = (idx, result)
+            elif self._hot is not None and self._hot[0] == idx:
+                self._hot = None
+            try:
+                self.store.put_result(self.token, idx, result)
+            except sqlite3.Error as e:
+                print(f"Could not store answer {idx}: {str(e)}")
+        # Outside our lock: enforcing the cap takes other sessions' locks
+        enforce_memory_limit()
+
+    def __delitem__(self, idx):
+        with self._lock:
+            del self._loaded()[idx]
+            if self._hot is not None and self._hot[0] == idx:
+                self._hot = None
+            try:
+                self.store.delete_result(self.token, idx)
+            except sqlite3.Error as e:
+                print(f"Could not delete stored answer {idx}: {str(e)}")
+
+    def __contains__(self, idx):
+        with self._lock:
+            return idx in self._loaded()
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._loaded()))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._loaded())
+
+    def clear(self):
+        with self._lock:
+            self._data = {}
+            self._hot = None
+            self.last_used = time.monotonic()
+            try:
+                self.store.clear_results(self.token)
+            except sqlite3.Error as e:
+                print(f"Could not clear stored answers: {str(e)}")
+
+    # Index of the answer on screen
+    @property
+    def displayed(self):
+        return self._displayed
+
+    @displayed.setter
+    def displayed(self, idx):
+        with self._lock:
+            self._displayed = idx
+            if self._hot is not None and self._hot[0] != idx:
+                self._hot = None
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    # Bytes of memory held by this session's answers (compressed, plus the one on
+    # screen) - what unload() frees. The idea text stays in memory and is not counted.
+    def memory_bytes(self):
+        with self._lock:
+            size = 0
+            if self._data is not None:
+                size += sum(sys.getsizeof(compressed) for compressed in self._data.values())
+            if self._hot is not None:
+                size += sys.getsizeof(self._hot[1])
+            return size
+
+    # Drop the answers from memory; the next access reads them back from the store
+    def unload(self):
+        with self._lock:
+            self._data = None
+            self._hot = None
+
+# Unload the answers of sessions not used for SESSION_IDLE_SECONDS.
+# Registered as a session scheduler task.
+def evict_idle_results():
+    cutoff = time.monotonic() - SESSION_IDLE_SECONDS
+    evicted = 0
+    for results in list(_live_results.values()):
+        if results.loaded and results.last_used < cutoff:
+            results.unload()
+            evicted += 1
+    if evicted:
+        print(f"Unloaded the answers of {evicted} idle sessions")
+
+_spilled = 0
+_spill_lock = threading.Lock()
+
+# Unload least recently used sessions until the answers of all sessions fit in
+# SESSION_MEMORY_LIMIT_MB. Returns the number of sessions spilled.
+def enforce_memory_limit():
+    global _spilled
+    limit = SESSION_MEMORY_LIMIT_MB * 1024 * 1024
+    if limit <= 0:
+        return 0
+    with _spill_lock:
+        sessions = [(results.memory_bytes(), results) for results in list(_live_results.values())]
+        total = sum(size for size, _ in sessions)
+        if total <= limit:
+            return 0
+        spilled = 0
+        for size, results in sorted(sessions, key=lambda entry: entry[1].last_used):
+            if total <= limit:
+                break
+            if not results.loaded:
+                continue
+            results.unload()
+            total -= size - results.memory_bytes()
+            spilled += 1
+        _spilled += spilled
+    if spilled:
+        print(f"Session memory over {SESSION_MEMORY_LIMIT_MB:g} MB - spilled {spilled} sessions to disk")
+    return spilled
+
+# Memory accounting of every session in the process
+# (answers, which count against the limit, plus the idea texts, which do not)
+def memory_stats():
+    sessions = {}
+    answer_bytes = 0
+    for results in list(_live_results.values()):
+        size = results.memory_bytes()
+        answer_bytes += size
+        sessions[results.token] = sessions.get(results.token, 0) + size + sys.getsizeof(results.idea)
+    return {
+        "sessions": sessions,
+        "total_bytes": sum(sessions.values()),
+        "answer_bytes": answer_bytes,
+        "loaded_sessions": sum(1 for results in list(_live_results.values()) if results.loaded),
+        "limit_bytes": int(SESSION_MEMORY_LIMIT_MB * 1024 * 1024),
+        "spilled": _spilled,
+    }
@@ -0,0 +1,299 @@
+"""Local stand-in for the OpenAI chat completions API, for offline load tests and benchmarks.
+
+    python standin_server.py [--port 8765] [--ttft-ms 600] [--tokens-per-second 40]
+                             [--rate-429 0.05] [--rate-5xx 0.02] [--rate-disconnect 0.02]
+                             [--responses canned.jsonl] [--recorded]
+
+Point the app, batch_runner.py or a benchmark at it with
+
+    OPENAI_STANDIN_URL=http://127.0.0.1:8765/v1 streamlit run streamlit_app.py
+
+It serves POST /v1/chat/completions, streamed or not, and GET /v1/models.
+Answers come from the first of these sources that has one:
+  - with --recorded, the response cache - a real answer recorded for the
+    identical request (model, messages, temperature and max_tokens);
+  - --responses, a JSONL file of {"match": "...", "response": "..."} entries - the
+    first entry whose "match" appears in the last user message ("match" may be
+    left out to answer everything);
+  - a generated markdown answer of --answer-tokens words with a table.
+
+Every word is sent as one token. A streamed answer waits --ttft-ms before its
+first token, then arrives at --tokens-per-second; --jitter varies both. A request
+is answered with 429 (with Retry-After), a 5xx, or a stream that is cut off after
+part of the answer, at the given rates. max_tokens is honoured.
+"""
+import re
+import sys
+import json
+import time
+import random
+import socket
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from openai_client import MODEL
+from response_cache import RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_BYTES, ResponseCache, make_cache_key
+
+TOKEN_PATTERN = re.compile(r"\S+\s*")
+
+VOCABULARY = ("market", "customer", "segment", "pricing", "channel", "revenue", "growth", "risk", "team",
+              "product", "users", "demand", "cost", "value", "partners", "adoption", "retention", "launch")
+
+# Split an answer into the tokens it is streamed as (one per word, with its whitespace)
+def split_tokens(text):
+    return TOKEN_PATTERN.findall(text) or [text]
+
+# A markdown answer in the shape the model produces - heading, paragraphs, bullets
+# and a table - of about `words` words. The same prompt always gets the same answer.
+def generated_answer(prompt, words):
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+    phrase = lambda count: " ".join(rng.choice(VOCABULARY) for _ in range(count))
+    parts = ["### Analysis", ""]
+    size = 0
+    while size < words:
+        parts.append(phrase(40).capitalize() + ".")
+        parts.append("")
+        for _ in range(4):
+            parts.append(f"- **{phrase(2).title()}**: {phrase(10)}")
+        parts.append("")
+        parts.append("| Segment | Size | Urgency | Example users |")
+        parts.append("| --- | --- | --- | --- |")
+        for row in range(5):
+            parts.append(f"| {phrase(2).title()} | {rng.randint(10, 900)}k | {rng.choice(('High', 'Medium', 'Low'))} "
+                         f"| {phrase(3)} |")
+        parts.append("")
+        size += 40 + 4 * 12 + 5 * 8
+    return "\n".join(parts)
+
+# Settings and answer sources shared by every request
+class StandinConfig:
+    def __init__(self, args):
+        self.ttft = args.ttft_ms / 1000
+        self.tokens_per_second = args.tokens_per_second
+        self.jitter = args.jitter
+        self.rate_429 = args.rate_429
+        self.rate_5xx = args.rate_5xx
+        self.rate_disconnect = args.rate_disconnect
+        self.retry_after = args.retry_after
+        self.answer_tokens = args.answer_tokens
+        self.quiet = args.quiet
+        self.random = random.Random(args.seed)
+        self.canned = self._load_canned(args.responses) if args.responses else []
+        self.recorded = ResponseCache(args.recorded, float("inf"), RESPONSE_CACHE_MAX_BYTES) if args.recorded else None
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _load_canned(path):
+        entries = []
+        with open(path, "r", encoding="utf-8") as canned_file:
+            for line in canned_file:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries.append((entry.get("match", ""), entry["response"]))
+        return entries
+
+    # A delay around `seconds`, varied by the jitter fraction
+    def delay(self, seconds):
+        with self.lock:
+            return max(seconds * (1 + self.random.uniform(-self.jitter, self.jitter)), 0)
+
+    def chance(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def choice(self, options):
+        with self.lock:
+            return self.random.choice(options)
+
+    def randint(self, low, high):
+        with self.lock:
+            return self.random.randint(low, high)
+
+    # (answer, source) for a request body
+    def answer(self, request):
+        messages = request.get("messages") or []
+        if self.recorded is not None:
+            key = make_cache_key(request.get("model"), messages, request.get("temperature"), request.get("max_tokens"))
+            recorded = self.recorded.get(key)
+            if recorded is not None:
+                return recorded, "recorded"
+        last_user = next((message.get("content") or "" for message in reversed(messages)
+                          if message.get("role") == "user"), "")
+        for match, response in self.canned:
+            if match in last_user:
+                return response, "canned"
+        return generated_answer(last_user, self.answer_tokens), "generated"
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": MODEL, "object": "model", "owned_by": "standin"}]})
+        else:
+            self._send_error_json(404, "Not found", "invalid_request_error")
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_error_json(404, "Not found", "invalid_request_error")
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+        except ValueError:
+            self._send_error_json(400, "Request body is not valid JSON", "invalid_request_error")
+            return
+
+        config = self.config
+        with config.lock:
+            config.requests += 1
+            number = config.requests
+        if config.chance(config.rate_429):
+            self._log(number, "429 injected")
+            self._send_error_json(429, "Rate limit reached (stand-in)", "requests", code="rate_limit_exceeded",
+                                  headers={"retry-after": f"{config.retry_after:g}"})
+            return
+        if config.chance(config.rate_5xx):
+            status = config.choice((500, 502, 503))
+            self._log(number, f"{status} injected")
+            self._send_error_json(status, "The server had an error (stand-in)", "server_error")
+            return
+
+        answer, source = config.answer(request)
+        tokens = split_tokens(answer)
+        finish_reason = "stop"
+        max_tokens = request.get("max_completion_tokens") or request.get("max_tokens")
+        if max_tokens and len(tokens) > max_tokens:
+            tokens = tokens[:max_tokens]
+            finish_reason = "length"
+        completion = {
+            "id": f"chatcmpl-standin-{number}",
+            "created": int(time.time()),
+            "model": request.get("model") or MODEL,
+        }
+        prompt_tokens = sum(len(split_tokens(message.get("content") or "")) for message in request.get("messages") or [])
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+
+        if not request.get("stream"):
+            time.sleep(config.delay(config.ttft + len(tokens) / config.tokens_per_second))
+            self._send_json(200, dict(completion, object="chat.completion", usage=usage, choices=[{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": finish_reason,
+            }]))
+            self._log(number, f"200 {len(tokens)} tokens ({source})")
+            return
+
+        disconnect_after = None
+        if len(tokens) > 1 and config.chance(config.rate_disconnect):
+            disconnect_after = config.randint(1, len(tokens) - 1)
+        self._stream(completion, tokens, finish_reason, usage, disconnect_after,
+                     include_usage=(request.get("stream_options") or {}).get("include_usage"))
+        outcome = f"cut off after {disconnect_after} of {len(tokens)} tokens" if disconnect_after else f"{len(tokens)} tokens"
+        self._log(number, f"200 stream {outcome} ({source})")
+
+    def _stream(self, completion, tokens, finish_reason, usage, disconnect_after, include_usage):
+        config = self.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_chunk(delta, finish=None, **extra):
+            chunk = dict(completion, object="chat.completion.chunk",
+                         choices=[{"index": 0, "delta": delta, "finish_reason": finish}] if delta is not None else [],
+                         **extra)
+            self._write_event(json.dumps(chunk))
+
+        try:
+            time.sleep(config.delay(config.ttft))
+            send_chunk({"role": "assistant", "content": ""})
+            interval = 1 / config.tokens_per_second
+            for position, token in enumerate(tokens):
+                if position:
+                    time.sleep(config.delay(interval))
+                if disconnect_after is not None and position == disconnect_after:
+                    # Drop the connection mid-stream, as a proxy or a crashed upstream would
+                    self.wfile.write(b"5\r\ndata:")
+                    self.wfile.flush()
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    self.close_connection = True
+                    return
+                send_chunk({"content": token})
+            send_chunk({}, finish=finish_reason)
+            if include_usage:
+                send_chunk(None, usage=usage)
+            self._write_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the stream (cancelled or timed out)
+            self.close_connection = True
+
+    def _write_event(self, data):
+        payload = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_error_json(self, status, message, error_type, code=None, headers=None):
+        self._send_json(status, {"error": {"message": message, "type": error_type, "param": None, "code": code}},
+                        headers)
+
+    def _log(self, number, message):
+        if not self.config.quiet:
+            print(f"[{number}] {self.command} {self.path} -> {message}", flush=True)
+
+    # Request lines are logged by _log instead
+    def log_message(self, format, *args):
+        pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft-ms", type=float, default=600, help="time to the first streamed token")
+    parser.add_argument("--tokens-per-second", type=float, default=40)
+    parser.add_argument("--jitter", type=float, default=0.2, help="random variation of every delay, as a fraction")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="share of requests answered with 500/502/503")
+    parser.add_argument("--rate-disconnect", type=float, default=0.0, help="share of streams cut off midway")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--answer-tokens", type=int, default=700, help="length of generated answers in words")
+    parser.add_argument("--responses", help="JSONL file of canned answers")
+    parser.add_argument("--recorded", nargs="?", const=RESPONSE_CACHE_PATH, default=None,
+                        help=f"replay answers recorded in a response cache (default {RESPONSE_CACHE_PATH})")
+    parser.add_argument("--seed", type=int, default=None, help="seed for error injection and jitter")
+    parser.add_argument("--quiet", action="store_true", help="do not log every request")
+    args = parser.parse_args(argv)
+    if args.tokens_per_second <= 0:
+        parser.error("--tokens-per-second must be positive")
+
+    StandinHandler.config = StandinConfig(args)
+    server = ThreadingHTTPServer((args.host, args.port), StandinHandler)
+    server.daemon_threads = True
+    print(f"Stand-in OpenAI API at http://{args.host}:{args.port}/v1 "
+          f"(TTFT {args.ttft_ms:g}ms, {args.tokens_per_second:g} tokens/s)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())